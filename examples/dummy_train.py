@@ -1,6 +1,15 @@
 import time
 import argparse
 import random
+import signal
+
+# Set by the signal handler; GapWatch sends SIGINT when an energy budget is reached.
+stop_requested = False
+
+def request_stop(signum, frame):
+    global stop_requested
+    print(f"Received signal {signum}: will checkpoint and stop after the current epoch.")
+    stop_requested = True
 
 def train_model(epochs=3, learning_rate=0.01, feature_dim=100):
     print(f"Starting dummy training...")
@@ -13,6 +22,9 @@ def train_model(epochs=3, learning_rate=0.01, feature_dim=100):
         loss = random.uniform(0.1, 0.5) / epoch
         accuracy = 1.0 - loss - random.uniform(0, 0.1)
         print(f"  Loss: {loss:.4f}, Accuracy: {accuracy:.4f}")
+        if stop_requested:
+            print(f"Checkpoint saved to 'dummy_model_epoch{epoch}.pth'. Stopping early.")
+            return
     
     print("Dummy training complete.")
     print("Final (simulated) model saved to 'dummy_model.pth'")
@@ -25,5 +37,6 @@ if __name__ == "__main__":
     # Add any other dummy parameters you might want
 
     args = parser.parse_args()
-    
+
+    signal.signal(signal.SIGINT, request_stop)
     train_model(epochs=args.epochs, learning_rate=args.lr, feature_dim=args.feature_dim)
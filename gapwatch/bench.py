@@ -0,0 +1,283 @@
+"""
+Module for benchmarking GapWatch's own hot paths.
+
+This module provides a small registry of benchmarks, each timing one GapWatch
+operation (energy integration, manifest generation, EdgeGuard checks, run store
+queries, sampler ticks, ...). Results are written to the run store keyed by
+git commit so that two commits can be compared for performance regressions.
+"""
+import contextlib
+import io
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+if __name__ == "__main__":
+    # Add the parent directory to sys.path so this file can be run directly,
+    # as cli.py does
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gapwatch import edgeguard
+from gapwatch import energy
+from gapwatch import profiler
+from gapwatch import replay
+from gapwatch import runstore
+from gapwatch import trends
+
+# Relative slowdown of the median time tolerated before a benchmark is flagged
+# as a regression by compare_results (0.10 = 10% slower).
+DEFAULT_NOISE_THRESHOLD = 0.10
+
+# Registered benchmarks: name -> {"setup": callable, "repeat": int}
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=5):
+    """
+    Registers a benchmark.
+
+    The decorated function receives a scratch directory and returns a
+    zero-argument callable; only that callable is timed.
+
+    Args:
+        name (str): Unique benchmark name.
+        repeat (int, optional): Number of timed repetitions. Defaults to 5.
+    """
+    def register(setup):
+        BENCHMARKS[name] = {"setup": setup, "repeat": repeat}
+        return setup
+    return register
+
+
+@benchmark("energy_integration_large_trace")
+def _bench_energy_integration(workdir):
+    meter = energy.GreenMeter()
+    meter.start_time = 0.0
+    meter.end_time = 100000.0
+    meter.energy_readings = [
+        {"timestamp": float(i), "source": "simulated", "value_kwh": 0.150 / 3600}
+        for i in range(100000)
+    ]
+    return lambda: meter.get_energy_usage(tokens_processed=1000000)
+
+
+@benchmark("sampler_tick")
+def _bench_sampler_tick(workdir):
+    meter = energy.GreenMeter()
+    meter._last_sample_time = 0.0
+    meter._last_power_w = energy.SIMULATED_POWER_W
+
+    def run_ticks():
+        for i in range(10000):
+            meter._sample(now=float(i))
+    return run_ticks
+
+
+@benchmark("sampler_tick_profiled")
+def _bench_sampler_tick_profiled(workdir):
+    meter = energy.GreenMeter(config={"profile": True})
+    meter._last_sample_time = 0.0
+    meter._last_power_w = energy.SIMULATED_POWER_W
+    meter.profiler = profiler.EnergyProfiler(thread_id=threading.get_ident())
+
+    def run_ticks():
+        for i in range(10000):
+            meter._sample(now=float(i))
+    return run_ticks
+
+
+@benchmark("manifest_generation", repeat=3)
+def _bench_manifest_generation(workdir):
+    output_path = os.path.join(workdir, "bench_manifest.jsonld")
+    return lambda: replay.create_manifest(output_path=output_path)
+
+
+@benchmark("dataset_hashing")
+def _bench_dataset_hashing(workdir):
+    data_dir = os.path.join(workdir, "dataset")
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(8):
+        with open(os.path.join(data_dir, f"shard_{i}.bin"), "wb") as f:
+            f.write(os.urandom(4 * 1024 * 1024))
+    return lambda: replay.hash_dataset(data_dir)
+
+
+@benchmark("edgeguard_streaming_eval", repeat=3)
+def _bench_edgeguard_streaming(workdir):
+    data_dir = os.path.join(workdir, "eval_shards")
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(32):
+        with open(os.path.join(data_dir, f"shard_{i:03d}.txt"), "w") as f:
+            f.write("\n".join(str(j) for j in range(10000)) + "\n")
+    return lambda: edgeguard.check_quantization_accuracy(
+        model_fp16_path="bench/fp16.pth",
+        model_quantized_path="bench/int8.pth",
+        test_dataset_path=data_dir,
+        accuracy_threshold_delta=0.05,
+        fp16_evaluator=len,
+        quantized_evaluator=len
+    )
+
+
+@benchmark("runstore_query")
+def _bench_runstore_query(workdir):
+    store = runstore.RunStore(root=os.path.join(workdir, "store"))
+    for i in range(10000):
+        store.append("bench_query", {"run": i, "branch": "main" if i % 2 else "dev", "total_kwh": i * 1e-6})
+    return lambda: store.query("bench_query", branch="main")
+
+
+@benchmark("trends_100k_runs", repeat=3)
+def _bench_trends(workdir):
+    # Load the history from a run store, as `gapwatch trends` does, so the
+    # timing covers reading the columns as well as the analysis
+    rng = random.Random(0)
+    n = 100000
+    store = runstore.RunStore(root=os.path.join(workdir, "trends_store"))
+    for i in range(n):
+        store.append("ci", {
+            "timestamp": float(i),
+            "commit": f"{i:040x}",
+            "branch": "main" if i % 4 else f"feature-{i % 8}",
+            "total_kwh": 0.1 + rng.gauss(0, 0.005) + (0.02 if i > n // 2 else 0.0),
+            "co2_emissions_kg": 0.025,
+            "watt_hours_per_token": 1e-5 + rng.gauss(0, 1e-7),
+            "accuracy_drop": 0.03 + rng.gauss(0, 0.002),
+            "latency_p95_ratio": None
+        })
+    fields = ["branch", "commit", "timestamp"] + trends.DEFAULT_METRICS
+    store.columns("ci", fields)  # Build the column cache, as earlier CI runs would have
+    return lambda: trends.compute_trends(store.columns("ci", fields))
+
+
+def get_git_commit(ref="HEAD"):
+    """
+    Resolves a git ref to a full commit hash.
+
+    Args:
+        ref (str, optional): The ref to resolve. Defaults to "HEAD".
+
+    Returns:
+        str: The commit hash, or the ref itself if git cannot resolve it.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", ref],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return ref
+
+
+def run_benchmarks(names=None, store=None, commit=None):
+    """
+    Runs the registered benchmarks and records the results.
+
+    Output printed by the benchmarked code is suppressed while timing.
+
+    Args:
+        names (list, optional): Benchmark names to run. Defaults to all.
+        store (RunStore, optional): Store to append the result to under the
+                                    "bench" kind. Defaults to None (not stored).
+        commit (str, optional): Commit the results belong to. Defaults to the
+                                current git HEAD.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'commit' (str): The commit the results belong to.
+            - 'timestamp' (float): When the run started (Unix time).
+            - 'benchmarks' (dict): name -> {'repeat', 'min_s', 'median_s',
+                                   'mean_s', 'stdev_s'}.
+    """
+    selected = names if names else sorted(BENCHMARKS)
+    result = {
+        "commit": commit or get_git_commit(),
+        "timestamp": time.time(),
+        "benchmarks": {}
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in selected:
+            if name not in BENCHMARKS:
+                print(f"Bench: Unknown benchmark '{name}', skipping.")
+                continue
+            spec = BENCHMARKS[name]
+            timings = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                func = spec["setup"](workdir)
+                for _ in range(spec["repeat"]):
+                    start = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - start)
+            result["benchmarks"][name] = {
+                "repeat": spec["repeat"],
+                "min_s": min(timings),
+                "median_s": statistics.median(timings),
+                "mean_s": statistics.mean(timings),
+                "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0
+            }
+            print(f"Bench: {name}: median {result['benchmarks'][name]['median_s'] * 1000:.3f} ms")
+
+    if store is not None:
+        store.append("bench", result)
+    return result
+
+
+def compare_results(baseline, candidate, threshold=DEFAULT_NOISE_THRESHOLD):
+    """
+    Compares two benchmark results by median time.
+
+    Args:
+        baseline (dict): A result from run_benchmarks for the reference commit.
+        candidate (dict): A result from run_benchmarks for the commit under test.
+        threshold (float, optional): Relative slowdown tolerated as noise.
+                                     Defaults to DEFAULT_NOISE_THRESHOLD.
+
+    Returns:
+        list: One dict per benchmark present in both results, containing
+              'name', 'baseline_s', 'candidate_s', 'change' (relative change
+              in median time) and 'regression' (bool).
+    """
+    rows = []
+    for name in sorted(set(baseline["benchmarks"]) & set(candidate["benchmarks"])):
+        base_s = baseline["benchmarks"][name]["median_s"]
+        cand_s = candidate["benchmarks"][name]["median_s"]
+        change = (cand_s - base_s) / base_s if base_s > 0 else 0.0
+        rows.append({
+            "name": name,
+            "baseline_s": base_s,
+            "candidate_s": cand_s,
+            "change": change,
+            "regression": change > threshold
+        })
+    return rows
+
+
+def find_result(store, ref):
+    """
+    Returns the latest stored benchmark result for a git ref, or None.
+
+    Args:
+        store (RunStore): The store to search.
+        ref (str): A git ref or (possibly abbreviated) commit hash.
+    """
+    commit = get_git_commit(ref)
+    matches = [r for r in store.query("bench") if r.get("commit", "").startswith(commit)]
+    return matches[-1] if matches else None
+
+
+if __name__ == "__main__":
+    print("Running GapWatch benchmark suite...")
+    results = run_benchmarks()
+    print(f"Results for commit {results['commit']}:")
+    for bench_name, stats in results["benchmarks"].items():
+        print(f"  {bench_name}: {stats}")
@@ -11,6 +11,10 @@ try:
     from gapwatch import energy
     from gapwatch import edgeguard
     from gapwatch import jules_connector
+    from gapwatch import bench
+    from gapwatch import runstore
+    from gapwatch import trends
+    from gapwatch import exporters
 except ImportError:
     # This might happen if gapwatch is not installed and cli.py is run from outside its dir
     print("Error: Could not import GapWatch modules. Make sure GapWatch is installed or run from the project root.")
@@ -26,29 +30,108 @@ except ImportError:
     energy = MockModule('energy')
     edgeguard = MockModule('edgeguard')
     jules_connector = MockModule('jules_connector')
+    bench = MockModule('bench')
+    runstore = MockModule('runstore')
+    trends = MockModule('trends')
+    exporters = MockModule('exporters')
 
 
 def handle_init(args):
     print("Initializing GapWatch...")
-    replay.create_manifest(output_path=args.output_path)
+    replay.create_manifest(output_path=args.output_path, data_paths=args.data)
     print(f"Manifest created at {os.path.join(os.getcwd(), args.output_path)}")
 
 def handle_train(args):
     print(f"Starting GapWatch training monitoring for script: {args.script}")
     print(f"Epochs: {args.epochs}")
 
-    meter = energy.GreenMeter()
-    meter.start_monitoring()
-    
-    # Simulate training script execution
-    print(f"Executing training script: python {args.script} --epochs {args.epochs} ...")
-    # In a real scenario, you'd use subprocess to run the script
-    # For now, just simulate some time passing
-    import time
-    time.sleep(5) # Simulate a 5-second training job
-    print("Training script finished.")
+    import signal
+    import subprocess
+    import threading
+
+    budget_signal = getattr(signal, args.budget_signal, None)
+    if not isinstance(budget_signal, signal.Signals):
+        print(f"Error: Unknown signal '{args.budget_signal}' for --budget-signal.")
+        sys.exit(2)
+
+    if args.export_parquet:
+        try:
+            exporters.require_pyarrow()
+        except ImportError as e:
+            print(f"Error: --export-parquet: {e}")
+            sys.exit(2)
+
+    process = None
+    stop_requested = threading.Event()
+
+    def stop_job(report):
+        # Called from the GreenMeter sampler thread: ask the job to checkpoint
+        # and stop, then terminate it if it is still running after the grace period.
+        def terminate_if_running():
+            if process.poll() is None:
+                print(f"Training job did not stop within {args.budget_grace}s; terminating.")
+                process.terminate()
+
+        print(f"Energy budget {report['budget']} reached; sending {args.budget_signal} to the training job.")
+        if process.poll() is None:
+            stop_requested.set()
+            process.send_signal(budget_signal)
+            timer = threading.Timer(args.budget_grace, terminate_if_running)
+            timer.daemon = True
+            timer.start()
+
+    meter_config = {
+        "max_kwh": args.max_kwh,
+        "max_co2_kg": args.max_co2,
+        "on_budget_exceeded": stop_job,
+        # The job may take up to the grace period to stop after the signal
+        "budget_stop_latency_s": args.budget_grace
+    }
+    if args.metrics_port is not None:
+        # Keep scraped counters fresh despite adaptive sampling
+        meter_config["max_sample_interval_s"] = exporters.SCRAPE_MAX_SAMPLE_INTERVAL_S
+    meter = energy.GreenMeter(config=meter_config)
+
+    # The job gets up to --budget-grace seconds to stop after the signal; a
+    # budget that the grace period alone would use up cannot be honoured
+    grace_kwh = meter.power_source() * args.budget_grace / 3.6e6
+    for option, limit, grace_use in (("--max-kwh", args.max_kwh, grace_kwh),
+                                     ("--max-co2", args.max_co2, grace_kwh * meter.co2_intensity)):
+        if limit is not None and grace_use >= limit:
+            print(f"Error: {option} {limit} would be used up by the {args.budget_grace}s --budget-grace period alone "
+                  f"({grace_use:.6g} at the current power draw). Raise the budget or lower --budget-grace.")
+            sys.exit(2)
+    run_id = "simulated_run_123" # Placeholder until runs are saved
+
+    # Bind the metrics port before starting the job, so a busy port cannot
+    # leave an unmonitored job behind
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = exporters.MetricsServer(meter, host=args.metrics_host, port=args.metrics_port, labels={"run_id": run_id})
+        try:
+            metrics_server.start()
+        except OSError as e:
+            print(f"Error: Could not serve metrics on {args.metrics_host}:{args.metrics_port}: {e}")
+            sys.exit(2)
+
+    command = [sys.executable, args.script, "--epochs", str(args.epochs)]
+    print(f"Executing training script: {' '.join(command)} ...")
+    try:
+        process = subprocess.Popen(command)
+        meter.start_monitoring()
+        returncode = process.wait()
+    except BaseException:
+        # Do not leave the job running if monitoring fails or we are interrupted
+        if process is not None and process.poll() is None:
+            process.terminate()
+        raise
+    finally:
+        if meter.start_time is not None:
+            meter.stop_monitoring()
+        if metrics_server is not None:
+            metrics_server.stop()
+    print(f"Training script finished with exit code {returncode}.")
 
-    meter.stop_monitoring()
     energy_data = meter.get_energy_usage(tokens_processed=args.tokens) # Example token count
 
     print("\n--- Energy Report ---")
@@ -57,21 +140,60 @@ def handle_train(args):
     if energy_data['watt_hours_per_token']:
         print(f"Watt-hours / token: {energy_data['watt_hours_per_token']:.6f}")
     
-    # Placeholder for saving run data
-    run_id = "simulated_run_123"
     print(f"Run ID: {run_id}")
+    if meter.budget_exceeded:
+        print(f"Training was stopped early: energy budget {meter.budget_exceeded['budget']} ({meter.budget_exceeded['limit']}) reached.")
+
+    export_failed = False
+    if args.export_parquet:
+        try:
+            exporters.export_trace_parquet(meter, args.export_parquet, run_id=run_id)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Error exporting energy trace to {args.export_parquet}: {e}")
+            export_failed = True
     print("Training monitoring complete.")
+    if returncode != 0 and not stop_requested.is_set():
+        # Failures other than the requested budget stop fail the command too
+        sys.exit(returncode if returncode > 0 else 1)
+    if export_failed:
+        sys.exit(1)
 
 def handle_replay(args):
     print(f"Replaying GapWatch run ID: {args.run_id}")
     # In a real scenario, you would load the manifest for this run_id
     # and re-execute based on its contents.
-    print("Fetching manifest for run_id...")
+    print(f"Fetching manifest for run_id from {args.manifest}...")
+    replay.check_hardware(args.manifest)
     print("Setting up environment based on manifest...")
     print("Re-executing script...")
     print(f"Replay for run_id {args.run_id} complete (simulation).")
 
+def parse_cpu_list(value):
+    """Parses a CPU list such as "0-3,6" into a sorted list of CPU ids."""
+    cpus = set()
+    try:
+        for part in value.split(","):
+            first, _, last = part.strip().partition("-")
+            cpus.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid CPU list '{value}' (expected e.g. '0-3,6')")
+    if not cpus:
+        raise argparse.ArgumentTypeError(f"empty CPU list '{value}'")
+    return sorted(cpus)
+
 def handle_ci(args):
+    if args.latency and not args.quantize:
+        print("Error: --latency requires --quantize.")
+        sys.exit(2)
+    if args.latency_threads < 1:
+        print("Error: --latency-threads must be at least 1.")
+        sys.exit(2)
+    if args.latency_cpus is not None and hasattr(os, "sched_getaffinity"):
+        unavailable = sorted(set(args.latency_cpus) - os.sched_getaffinity(0))
+        if unavailable:
+            print(f"Error: --latency-cpus: CPUs {unavailable} are not available to this process "
+                  f"(allowed: {sorted(os.sched_getaffinity(0))}).")
+            sys.exit(2)
     print("Starting GapWatch CI process...")
     
     # 1. Create Manifest (simulated, or could call replay.create_manifest)
@@ -95,6 +217,7 @@ def handle_ci(args):
 
     # 3. EdgeGuard Check (simulated)
     print("\nStep 3: Running EdgeGuard check...")
+    latency_results = None
     if args.quantize:
         print(f"Quantization type: {args.quantize}")
         # Simulate paths for models and data
@@ -112,8 +235,49 @@ def handle_ci(args):
             print("  ALERT: Quantization accuracy drop EXCEEDS threshold!")
         else:
             print("  Quantization accuracy drop is within acceptable limits.")
+
+        if args.latency:
+            # Simulated stand-ins until real model loading is added
+            latency_results = edgeguard.check_quantization_latency(
+                fp16_fn=edgeguard.simulated_model(cost=1.0),
+                quantized_fn=edgeguard.simulated_model(cost=0.5),
+                sample=[0],
+                batch=[0] * 8,
+                max_latency_ratio=args.max_latency_ratio,
+                max_p99_ms=args.max_p99_ms,
+                num_threads=args.latency_threads,
+                cpu_affinity=args.latency_cpus
+            )
+            print("--- EdgeGuard Latency Report ---")
+            for mode in ("single", "batched"):
+                fp16_stats = latency_results["latency_fp16"][mode]
+                quantized_stats = latency_results["latency_quantized"][mode]
+                print(f"  {mode.capitalize()} p50/p95/p99 (ms): FP16 {fp16_stats['p50_ms']:.3f}/{fp16_stats['p95_ms']:.3f}/{fp16_stats['p99_ms']:.3f}, "
+                      f"Quantized {quantized_stats['p50_ms']:.3f}/{quantized_stats['p95_ms']:.3f}/{quantized_stats['p99_ms']:.3f}")
+            if latency_results['latency_alert_triggered']:
+                print("  ALERT: Quantized model latency REGRESSED!")
+            else:
+                print("  Quantized model latency is within acceptable limits.")
     else:
         print("Skipping EdgeGuard check as --quantize not specified.")
+    accuracy_alert = bool(args.quantize and accuracy_results['alert_triggered'])
+    latency_alert = bool(latency_results and latency_results['latency_alert_triggered'])
+
+    # Persist the run so `gapwatch trends` can analyse the history
+    import time
+    branch = trends.get_git_branch()
+    store = runstore.RunStore(root=args.store)
+    store.append("ci", {
+        "timestamp": time.time(),
+        "commit": bench.get_git_commit(),
+        "branch": branch,
+        "total_kwh": energy_data['total_kwh'],
+        "co2_emissions_kg": energy_data['co2_emissions_kg'],
+        "watt_hours_per_token": energy_data['watt_hours_per_token'],
+        "accuracy_drop": accuracy_results['accuracy_drop'] if args.quantize else None,
+        "latency_p95_ratio": latency_results['p95_ratio'] if latency_results else None
+    })
+    print(f"\nCI run recorded in {args.store} for branch '{branch}'.")
 
     # 4. Notify (simulated)
     if args.notify:
@@ -124,6 +288,12 @@ def handle_ci(args):
             report_message += f"EdgeGuard ({args.quantize}): Drop {accuracy_results['accuracy_drop']:.4f}."
             if accuracy_results['alert_triggered']:
                 report_message += " ACCURACY ALERT!"
+        if latency_results:
+            report_message += f"\nLatency p95 ratio (quantized/FP16): {latency_results['p95_ratio']:.2f}."
+            if latency_alert:
+                report_message += " LATENCY ALERT!"
+        history = store.columns("ci", ["branch", "commit", "timestamp"] + trends.DEFAULT_METRICS)
+        report_message += "\n\n" + trends.format_trends_summary(trends.compute_trends(history), branches=[branch])
         
         print(f"Notification message: {report_message}")
         jules_connector.post_pr_comment(message=report_message)
@@ -132,6 +302,62 @@ def handle_ci(args):
         print("\nSkipping notification as --notify not specified.")
         
     print("\nGapWatch CI process complete.")
+    if args.fail_on_alert and (accuracy_alert or latency_alert):
+        print("Failing CI run due to EdgeGuard alert (--fail-on-alert).")
+        sys.exit(1)
+
+def handle_trends(args):
+    store = runstore.RunStore(root=args.store)
+    history = store.columns("ci", ["branch", "commit", "timestamp"] + trends.DEFAULT_METRICS)
+    if not history["branch"]:
+        print(f"No CI runs recorded in {args.store}. Run 'gapwatch ci' first.")
+        return
+    if args.export_parquet:
+        try:
+            exporters.export_runs_parquet(store.query("ci"), args.export_parquet)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Error exporting CI runs to {args.export_parquet}: {e}")
+            sys.exit(1)
+    report = trends.compute_trends(history, window=args.window, t_threshold=args.threshold)
+    summary = trends.format_trends_summary(report, branches=[args.branch] if args.branch else None)
+    print(summary)
+    if args.notify:
+        jules_connector.post_pr_comment(message=summary)
+
+    regressed = [
+        f"{branch}/{metric}"
+        for branch, metrics in report.items() if not args.branch or branch == args.branch
+        for metric, trend in metrics.items() if trend["regressed"]
+    ]
+    if regressed:
+        print(f"ALERT: Regression changepoints detected in: {', '.join(regressed)}")
+
+def handle_bench_run(args):
+    print("Running GapWatch benchmarks...")
+    store = runstore.RunStore(root=args.store)
+    results = bench.run_benchmarks(names=args.only, store=store)
+    print(f"Benchmark results for commit {results['commit']} saved to {args.store}")
+
+def handle_bench_compare(args):
+    store = runstore.RunStore(root=args.store)
+    baseline = bench.find_result(store, args.baseline)
+    candidate = bench.find_result(store, args.candidate)
+    if baseline is None or candidate is None:
+        missing = args.baseline if baseline is None else args.candidate
+        print(f"Error: No benchmark results stored for '{missing}'. Run 'gapwatch bench run' on that commit first.")
+        sys.exit(2)
+
+    rows = bench.compare_results(baseline, candidate, threshold=args.threshold)
+    print(f"--- Benchmark Comparison ({baseline['commit'][:12]} -> {candidate['commit'][:12]}) ---")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"  {row['name']}: {row['baseline_s'] * 1000:.3f} ms -> {row['candidate_s'] * 1000:.3f} ms ({row['change']:+.1%}){flag}")
+
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"ALERT: {len(regressions)} benchmark(s) regressed beyond the {args.threshold:.0%} noise threshold.")
+        sys.exit(1)
+    print("No benchmark regressions beyond the noise threshold.")
 
 
 def main():
@@ -145,6 +371,7 @@ def main():
         default="gapwatch.jsonld", 
         help="Path to save the manifest file (default: gapwatch.jsonld)"
     )
+    parser_init.add_argument("--data", nargs="+", default=None, help="Dataset files or directories to hash into the manifest.")
     parser_init.set_defaults(func=handle_init)
 
     # Train command
@@ -152,20 +379,61 @@ def main():
     parser_train.add_argument("script", help="Path to the training script.")
     parser_train.add_argument("--epochs", type=int, default=1, help="Number of epochs for training.")
     parser_train.add_argument("--tokens", type=int, default=None, help="Optional: Number of tokens processed for energy normalization.")
+    parser_train.add_argument("--max-kwh", type=float, default=None, help="Optional: Energy budget in kWh; the job is signalled early enough to stop within it if it stops within --budget-grace.")
+    parser_train.add_argument("--max-co2", type=float, default=None, help="Optional: CO2 budget in kg; the job is signalled early enough to stop within it if it stops within --budget-grace.")
+    parser_train.add_argument("--budget-signal", default="SIGINT", help="Signal sent to the job when a budget is reached, so it can checkpoint and stop (default: SIGINT).")
+    parser_train.add_argument("--budget-grace", type=float, default=30.0, help="Seconds to wait after the budget signal before terminating the job (default: 30).")
     # Add other relevant training args as needed, e.g., --data, --model
+    parser_train.add_argument("--metrics-port", type=int, default=None, help="Optional: Serve live energy counters at http://HOST:PORT/metrics (OpenMetrics).")
+    parser_train.add_argument("--metrics-host", default="127.0.0.1", help="Address for --metrics-port (default: 127.0.0.1).")
+    parser_train.add_argument("--export-parquet", default=None, help="Optional: Write the finished energy trace to this Parquet file (requires pyarrow).")
     parser_train.set_defaults(func=handle_train)
 
     # Replay command
     parser_replay = subparsers.add_parser("replay", help="Deterministically rerun a previous GapWatch run.")
     parser_replay.add_argument("run_id", help="ID of the run to replay.")
+    parser_replay.add_argument("--manifest", default="gapwatch.jsonld", help="Manifest recorded for the run (default: gapwatch.jsonld)")
     parser_replay.set_defaults(func=handle_replay)
 
     # CI command
     parser_ci = subparsers.add_parser("ci", help="Run GapWatch in CI mode (includes quantization check & notification).")
     parser_ci.add_argument("--quantize", type=str, help="Quantization type (e.g., int8, int4). Enables EdgeGuard.")
     parser_ci.add_argument("--notify", action="store_true", help="Post results as a PR comment.")
+    parser_ci.add_argument("--latency", action="store_true", help="Also benchmark FP16 vs quantized latency (requires --quantize).")
+    parser_ci.add_argument("--max-latency-ratio", type=float, default=1.0, help="Allowed quantized/FP16 p95 latency ratio (default: 1.0).")
+    parser_ci.add_argument("--max-p99-ms", type=float, default=None, help="Optional: p99 latency budget for the quantized model in ms.")
+    parser_ci.add_argument("--latency-threads", type=int, default=1, help="Concurrent Python callers (threads in this process, not the runtime's intra-op threads) during the latency benchmark (default: 1).")
+    parser_ci.add_argument("--latency-cpus", type=parse_cpu_list, default=None, help="Optional: CPUs to pin the latency benchmark to, e.g. '0-3,6' (Linux only).")
+    parser_ci.add_argument("--fail-on-alert", action="store_true", help="Exit non-zero if an accuracy or latency alert fires.")
+    parser_ci.add_argument("--store", default=runstore.DEFAULT_STORE_DIR, help="Run store directory for the run history (default: .gapwatch)")
     parser_ci.set_defaults(func=handle_ci)
 
+    # Trends command
+    parser_trends = subparsers.add_parser("trends", help="Analyse CI run history for energy and accuracy regressions.")
+    parser_trends.add_argument("--branch", default=None, help="Only report this branch (default: all branches).")
+    parser_trends.add_argument("--window", type=int, default=trends.DEFAULT_WINDOW, help="Runs in the rolling baseline and on each side of a changepoint (default: 20).")
+    parser_trends.add_argument("--threshold", type=float, default=trends.DEFAULT_T_THRESHOLD, help="Welch t-statistic for a changepoint (default: 5.0).")
+    parser_trends.add_argument("--notify", action="store_true", help="Post the summary as a PR comment.")
+    parser_trends.add_argument("--store", default=runstore.DEFAULT_STORE_DIR, help="Run store directory (default: .gapwatch)")
+    parser_trends.add_argument("--export-parquet", default=None, help="Optional: Also write all recorded CI runs to this Parquet file (requires pyarrow).")
+    parser_trends.set_defaults(func=handle_trends)
+
+    # Bench command
+    parser_bench = subparsers.add_parser("bench", help="Benchmark GapWatch's own hot paths.")
+    bench_subparsers = parser_bench.add_subparsers(title="Bench commands", dest="bench_command", required=True)
+
+    parser_bench_run = bench_subparsers.add_parser("run", help="Run benchmarks and store results for the current commit.")
+    parser_bench_run.add_argument("--only", nargs="+", default=None, help="Run only the named benchmarks.")
+    parser_bench_run.add_argument("--store", default=runstore.DEFAULT_STORE_DIR, help="Run store directory (default: .gapwatch)")
+    parser_bench_run.set_defaults(func=handle_bench_run)
+
+    parser_bench_compare = bench_subparsers.add_parser("compare", help="Flag benchmark regressions between two commits.")
+    parser_bench_compare.add_argument("baseline", help="Baseline commit or git ref.")
+    parser_bench_compare.add_argument("candidate", help="Candidate commit or git ref.")
+    parser_bench_compare.add_argument("--threshold", type=float, default=bench.DEFAULT_NOISE_THRESHOLD, help="Relative slowdown tolerated as noise (default: 0.10)")
+    parser_bench_compare.add_argument("--store", default=runstore.DEFAULT_STORE_DIR, help="Run store directory (default: .gapwatch)")
+    parser_bench_compare.set_defaults(func=handle_bench_compare)
+
     if len(sys.argv) <= 1:
         parser.print_help(sys.stderr)
         sys.exit(1)
@@ -177,6 +445,11 @@ if __name__ == "__main__":
     # To test, you can run this script with arguments like:
     # python gapwatch/cli.py init
     # python gapwatch/cli.py train scripts/train_bert.py --epochs 3
+    # python gapwatch/cli.py train examples/dummy_train.py --epochs 20 --max-kwh 0.0005 --budget-grace 5
     # python gapwatch/cli.py replay run_xyz123
     # python gapwatch/cli.py ci --quantize int8 --notify
+    # python gapwatch/cli.py ci --quantize int8 --latency --fail-on-alert
+    # python gapwatch/cli.py trends --branch main
+    # python gapwatch/cli.py bench run
+    # python gapwatch/cli.py bench compare main HEAD
     main()
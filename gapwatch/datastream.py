@@ -0,0 +1,133 @@
+"""
+Module for streaming large sharded test sets in fixed-size batches.
+
+This module provides stream_batches, which memory-maps dataset shards, decodes
+them in a small thread pool with a bounded prefetch window, and yields
+fixed-size batches. At most `prefetch` + 1 decoded shards are held at any time
+(the one being batched plus the prefetch window), so peak memory is about
+(prefetch + 1) x the decoded size of a shard, independent of the size of the
+dataset.
+"""
+import collections
+import concurrent.futures
+import glob
+import mmap
+import os
+from typing import Callable, Iterator, List
+
+# Number of shards decoded ahead of the consumer.
+DEFAULT_PREFETCH = 4
+
+# Number of threads decoding shards.
+DEFAULT_NUM_WORKERS = 2
+
+
+def decode_lines(buffer) -> List[bytes]:
+    """
+    Default shard decoder: one sample per non-empty line.
+
+    Every line is copied out of the mapping into its own bytes object, so the
+    decoded shard costs about as much memory as the shard file plus per-object
+    overhead; the mapping only saves the intermediate read buffer. Decoders
+    that need less memory should return views or parsed values instead.
+
+    Args:
+        buffer (mmap.mmap): The memory-mapped shard contents.
+
+    Returns:
+        list: The samples in the shard, as bytes.
+    """
+    return [line.rstrip(b"\n") for line in iter(buffer.readline, b"") if line != b"\n"]
+
+
+def list_shards(dataset_path: str) -> List[str]:
+    """
+    Resolves a dataset path to its shard files, in a stable order.
+
+    Args:
+        dataset_path (str): A single file, a directory of shards (hidden files
+                            are ignored) or a glob pattern.
+
+    Returns:
+        list: Sorted shard file paths (empty if nothing matches).
+    """
+    if os.path.isdir(dataset_path):
+        return sorted(
+            os.path.join(dataset_path, name)
+            for name in os.listdir(dataset_path)
+            if not name.startswith(".") and os.path.isfile(os.path.join(dataset_path, name))
+        )
+    if os.path.isfile(dataset_path):
+        return [dataset_path]
+    return sorted(path for path in glob.glob(dataset_path) if os.path.isfile(path))
+
+
+def _load_shard(path: str, decode: Callable) -> list:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []  # mmap cannot map empty files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return decode(buffer)
+
+
+def stream_batches(
+    dataset_path: str,
+    batch_size: int,
+    decode: Callable = decode_lines,
+    prefetch: int = DEFAULT_PREFETCH,
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    drop_last: bool = False
+) -> Iterator[list]:
+    """
+    Yields fixed-size batches of samples from a sharded dataset.
+
+    Shards are decoded in order by a thread pool; no more than `prefetch`
+    shards are queued or in flight at once, in addition to the shard currently
+    being batched. Peak memory is therefore about (prefetch + 1) x the decoded
+    shard size.
+
+    Args:
+        dataset_path (str): A shard file, a directory of shards or a glob pattern.
+        batch_size (int): Number of samples per batch.
+        decode (callable, optional): Turns a memory-mapped shard into a list of
+                                     samples. Defaults to decode_lines.
+        prefetch (int, optional): Maximum number of shards decoded ahead.
+                                  Defaults to DEFAULT_PREFETCH.
+        num_workers (int, optional): Number of decoding threads.
+                                     Defaults to DEFAULT_NUM_WORKERS.
+        drop_last (bool, optional): Drop the final batch if it is smaller than
+                                    batch_size. Defaults to False.
+
+    Yields:
+        list: A batch of `batch_size` samples (the last one may be smaller).
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive.")
+    shards = iter(list_shards(dataset_path))
+    pending = collections.deque()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, num_workers))
+    try:
+        for path in shards:
+            pending.append(executor.submit(_load_shard, path, decode))
+            if len(pending) >= max(1, prefetch):
+                break
+
+        batch = []
+        while pending:
+            samples = pending.popleft().result()
+            next_path = next(shards, None)
+            if next_path is not None:
+                pending.append(executor.submit(_load_shard, next_path, decode))
+            for sample in samples:
+                batch.append(sample)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            del samples
+        if batch and not drop_last:
+            yield batch
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
@@ -5,25 +5,503 @@ This module provides functionality to compare the accuracy of a full-precision
 model (e.g., FP16) with its quantized version (e.g., INT8) and alert if
 the accuracy drop exceeds a predefined threshold.
 """
+import itertools
+import math
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy
+except ImportError:  # Optional: array activations then go through the pure-Python path
+    numpy = None
+
+
+if __name__ == "__main__":
+    # Add the parent directory to sys.path so this file can be run directly,
+    # as cli.py does
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gapwatch import datastream
+
+def _flatten(values) -> List[float]:
+    """Flattens nested lists/tuples (or objects with .tolist()) into a list of floats."""
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+    if not isinstance(values, (list, tuple)):
+        return [float(values)]
+    flat = []
+    for value in values:
+        if isinstance(value, (list, tuple)) or hasattr(value, "tolist"):
+            flat.extend(_flatten(value))
+        else:
+            flat.append(float(value))
+    return flat
+
+
+def _as_array(values):
+    """Converts activations (NumPy arrays, tensors or nested lists) to a flat float64 array."""
+    if hasattr(values, "detach"):
+        values = values.detach().cpu()  # PyTorch tensors, possibly on an accelerator
+    if not hasattr(values, "__array__"):
+        values = _flatten(values)
+    return numpy.asarray(values, dtype=numpy.float64).ravel()
+
+
+class LayerErrorStats:
+    """
+    Running error statistics between FP and quantized activations of one layer.
+
+    Only sums are kept, so batches can be added one at a time without holding
+    previous activations in memory. Array activations (NumPy arrays, PyTorch
+    tensors) are reduced with vectorized NumPy operations when NumPy is
+    installed; plain lists use a pure-Python loop.
+    """
+
+    def __init__(self, name: str, saturation_limit: Optional[float] = None):
+        self.name = name
+        self.saturation_limit = saturation_limit
+        self.count = 0
+        self.sum_sq_error = 0.0
+        self.sum_sq_fp = 0.0
+        self.sum_sq_quantized = 0.0
+        self.dot = 0.0
+        self.saturated = 0
+
+    def update(self, fp_activations, quantized_activations) -> None:
+        """Adds one batch of activations for this layer."""
+        if numpy is not None and (hasattr(fp_activations, "__array__") or hasattr(quantized_activations, "__array__")):
+            self._update_arrays(_as_array(fp_activations), _as_array(quantized_activations))
+            return
+        fp_values = _flatten(fp_activations)
+        quantized_values = _flatten(quantized_activations)
+        if len(fp_values) != len(quantized_values):
+            raise ValueError(f"Layer '{self.name}': FP and quantized activations differ in size.")
+        for fp, q in zip(fp_values, quantized_values):
+            self.sum_sq_error += (fp - q) ** 2
+            self.sum_sq_fp += fp * fp
+            self.sum_sq_quantized += q * q
+            self.dot += fp * q
+        if self.saturation_limit is not None:
+            self.saturated += sum(1 for q in quantized_values if abs(q) >= self.saturation_limit)
+        self.count += len(fp_values)
+
+    def _update_arrays(self, fp_values, quantized_values) -> None:
+        if fp_values.size != quantized_values.size:
+            raise ValueError(f"Layer '{self.name}': FP and quantized activations differ in size.")
+        error = fp_values - quantized_values
+        self.sum_sq_error += float(numpy.dot(error, error))
+        self.sum_sq_fp += float(numpy.dot(fp_values, fp_values))
+        self.sum_sq_quantized += float(numpy.dot(quantized_values, quantized_values))
+        self.dot += float(numpy.dot(fp_values, quantized_values))
+        if self.saturation_limit is not None:
+            self.saturated += int(numpy.count_nonzero(numpy.abs(quantized_values) >= self.saturation_limit))
+        self.count += fp_values.size
+
+    def summary(self) -> dict:
+        """Returns 'mse', 'relative_mse', 'cosine_similarity' and 'saturation_rate'."""
+        mse = self.sum_sq_error / self.count if self.count else 0.0
+        norms = math.sqrt(self.sum_sq_fp * self.sum_sq_quantized)
+        return {
+            "layer": self.name,
+            "num_values": self.count,
+            "mse": mse,
+            "relative_mse": self.sum_sq_error / self.sum_sq_fp if self.sum_sq_fp else 0.0,
+            "cosine_similarity": self.dot / norms if norms else 1.0,
+            "saturation_rate": self.saturated / self.count if self.count and self.saturation_limit is not None else None
+        }
+
+
+def sequential_runner(layers: Sequence[Tuple[str, Callable]]) -> Callable:
+    """
+    Builds a hook-calling runner from an ordered list of (name, layer) pairs.
+
+    The runner feeds a batch through each layer in turn and calls
+    hook(name, output) after every layer, like a PyTorch forward hook.
+    """
+    def run(batch, hook):
+        output = batch
+        for name, layer in layers:
+            output = layer(output)
+            hook(name, output)
+        return output
+    return run
+
+
+def profile_layer_errors(
+    fp16_runner: Callable,
+    quantized_runner: Callable,
+    batches: Iterable[list],
+    max_batches: int = 8,
+    saturation_limit: Union[float, Dict[str, float], None] = None
+) -> List[dict]:
+    """
+    Runs FP and quantized models side by side and ranks layers by error.
+
+    Each runner is called as runner(batch, hook) and must call
+    hook(layer_name, activations) for every layer it executes (e.g., from
+    PyTorch forward hooks, or see sequential_runner). For each batch, the FP
+    activations are held only until the quantized model has produced the same
+    layer; statistics are accumulated incrementally in LayerErrorStats.
+
+    The FP runner finishes before the quantized runner starts, so the FP
+    activations of every hooked layer for one batch are held at once: peak
+    memory is about batch size x the total activation size of the hooked
+    layers. Use smaller batches (or hook fewer layers) for large models.
+
+    Args:
+        fp16_runner (callable): Runs the full-precision model on a batch.
+        quantized_runner (callable): Runs the quantized model on a batch.
+        batches (iterable): Input batches, e.g. from datastream.stream_batches.
+        max_batches (int, optional): Number of batches to sample. Defaults to 8.
+        saturation_limit (float or dict, optional): Absolute activation value at
+                                                    or beyond which a quantized
+                                                    activation counts as saturated,
+                                                    globally or per layer name.
+                                                    Defaults to None (not computed).
+
+    Returns:
+        list: Per-layer summaries from LayerErrorStats.summary(), worst layer
+              (highest relative MSE) first.
+    """
+    stats = {}
+    for batch in itertools.islice(batches, max_batches):
+        fp_activations = {}
+
+        def capture(name, output):
+            fp_activations[name] = output
+
+        fp16_runner(batch, capture)
+
+        def compare(name, output):
+            if name not in fp_activations:
+                return # Layer only exists in the quantized model (e.g., quant/dequant stubs)
+            if name not in stats:
+                limit = saturation_limit.get(name) if isinstance(saturation_limit, dict) else saturation_limit
+                stats[name] = LayerErrorStats(name, saturation_limit=limit)
+            stats[name].update(fp_activations.pop(name), output)
+
+        quantized_runner(batch, compare)
+
+    return sorted((s.summary() for s in stats.values()), key=lambda row: row["relative_mse"], reverse=True)
+
+
+def format_layer_report(rows: List[dict], limit: int = 10) -> str:
+    """
+    Formats ranked per-layer error summaries as a text table.
+
+    Args:
+        rows (list): Output of profile_layer_errors.
+        limit (int, optional): Maximum number of layers shown. Defaults to 10.
+    """
+    lines = [f"{'Layer':<32} {'Rel. MSE':>10} {'MSE':>12} {'Cosine':>8} {'Saturated':>10}"]
+    for row in rows[:limit]:
+        saturation = f"{row['saturation_rate']:.2%}" if row["saturation_rate"] is not None else "n/a"
+        lines.append(
+            f"{row['layer']:<32} {row['relative_mse']:>10.4g} {row['mse']:>12.4g} "
+            f"{row['cosine_similarity']:>8.4f} {saturation:>10}"
+        )
+    return "\n".join(lines)
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with bounded relative error.
+
+    Values are recorded in microseconds into log-linear buckets: each power of
+    two is split into 2**sub_bucket_bits linear sub-buckets, so percentiles are
+    accurate to within 2**-sub_bucket_bits (under 1% by default) while memory
+    stays proportional to the dynamic range, not to the number of samples.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = {}  # (shift, sub_bucket) -> count
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def _bucket(self, value_us: int) -> Tuple[int, int]:
+        shift = max(0, value_us.bit_length() - self.sub_bucket_bits)
+        return shift, value_us >> shift
+
+    def record(self, seconds: float) -> None:
+        """Records one latency sample, in seconds."""
+        value_us = max(0, int(round(seconds * 1e6)))
+        key = self._bucket(value_us)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = value_us if self.max_us is None else max(self.max_us, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Adds all samples of another histogram with the same sub_bucket_bits."""
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        for value in (other.min_us, other.max_us):
+            if value is not None:
+                self.min_us = value if self.min_us is None else min(self.min_us, value)
+                self.max_us = value if self.max_us is None else max(self.max_us, value)
+
+    def percentile(self, percent: float) -> float:
+        """Returns the latency (in milliseconds) at the given percentile (0-100)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for shift, sub_bucket in sorted(self.counts, key=lambda key: key[1] << key[0]):
+            seen += self.counts[(shift, sub_bucket)]
+            if seen >= rank:
+                low = sub_bucket << shift
+                midpoint_us = low + ((1 << shift) - 1) / 2
+                return min(max(midpoint_us, self.min_us), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> dict:
+        """Returns count, mean, p50/p95/p99 and max latency in milliseconds."""
+        return {
+            "count": self.count,
+            "mean_ms": self.total_us / self.count / 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": (self.max_us or 0) / 1000
+        }
+
+
+def simulated_model(cost: float = 1.0) -> Callable:
+    """
+    Returns a stand-in inference function whose work scales with `cost` and
+    the batch size, until real model loading is added.
+    """
+    def infer(batch):
+        size = len(batch) if isinstance(batch, (list, tuple)) else 1
+        return sum(i * i for i in range(int(2000 * cost * size)))
+    return infer
+
+
+def _measure(model_fn: Callable, inputs, iterations: int, num_threads: int) -> LatencyHistogram:
+    # Each "thread" is a concurrent Python caller in this process, modelling
+    # concurrent requests; callers of pure-Python models contend for the GIL
+    histogram = LatencyHistogram()
+    per_thread = [iterations // num_threads + (1 if i < iterations % num_threads else 0) for i in range(num_threads)]
+    local_histograms = [LatencyHistogram() for _ in range(num_threads)]
+
+    def worker(calls, local):
+        for _ in range(calls):
+            start = time.perf_counter()
+            model_fn(inputs)
+            local.record(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(calls, local)) for calls, local in zip(per_thread, local_histograms)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for local in local_histograms:
+        histogram.merge(local)
+    return histogram
+
+
+def benchmark_latency(
+    model_fn: Callable,
+    sample,
+    batch: Optional[list] = None,
+    warmup: int = 10,
+    iterations: int = 200,
+    num_threads: int = 1,
+    cpu_affinity: Optional[Iterable[int]] = None
+) -> dict:
+    """
+    Measures the latency distribution of a model's inference function.
+
+    The function is first warmed up, then timed on single samples and,
+    if given, on a batch. With num_threads > 1 the iterations are split across
+    that many Python threads calling model_fn concurrently, which measures
+    latency under concurrent requests. This is not the runtime's intra-op
+    thread count (configure that on the runtime itself, e.g.
+    torch.set_num_threads). Models that hold the GIL, such as pure-Python
+    ones, run one call at a time, so their latency grows with the number of
+    callers. With cpu_affinity, the process is pinned to those CPUs for the
+    duration of the measurement (Linux only).
+
+    Args:
+        model_fn (callable): Runs inference on its single argument.
+        sample: One input sample.
+        batch (list, optional): A batch of inputs for batched latency. Defaults to None.
+        warmup (int, optional): Untimed warm-up calls. Defaults to 10.
+        iterations (int, optional): Timed calls per mode. Defaults to 200.
+        num_threads (int, optional): Concurrent Python callers. Defaults to 1.
+        cpu_affinity (iterable, optional): CPU ids to pin to. Defaults to None.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'single' (dict): LatencyHistogram.summary() for single samples.
+            - 'batched' (dict): Same for the batch, or None if no batch was given.
+            - 'num_threads' (int), 'cpu_affinity' (list or None), 'batch_size' (int or None).
+
+    Raises:
+        ValueError: If num_threads or iterations is below 1, or cpu_affinity
+                    names no CPU this process may run on.
+    """
+    if num_threads < 1 or iterations < 1:
+        raise ValueError("num_threads and iterations must be at least 1.")
+    previous_affinity = None
+    if cpu_affinity is not None:
+        if hasattr(os, "sched_setaffinity"):
+            previous_affinity = os.sched_getaffinity(0)
+            unavailable = set(cpu_affinity) - previous_affinity
+            if unavailable or not set(cpu_affinity):
+                raise ValueError(
+                    f"CPUs {sorted(unavailable)} are not available to this process "
+                    f"(allowed: {sorted(previous_affinity)})."
+                )
+            os.sched_setaffinity(0, set(cpu_affinity))
+        else:
+            print("EdgeGuard: Warning - CPU affinity is not supported on this platform; ignoring.")
+            cpu_affinity = None
+    try:
+        for _ in range(warmup):
+            model_fn(sample)
+            if batch is not None:
+                model_fn(batch)
+        single = _measure(model_fn, sample, iterations, num_threads)
+        batched = _measure(model_fn, batch, iterations, num_threads) if batch is not None else None
+    finally:
+        if previous_affinity is not None:
+            os.sched_setaffinity(0, previous_affinity)
+
+    return {
+        "single": single.summary(),
+        "batched": batched.summary() if batched is not None else None,
+        "num_threads": num_threads,
+        "cpu_affinity": sorted(cpu_affinity) if cpu_affinity is not None else None,
+        "batch_size": len(batch) if batch is not None else None
+    }
+
+
+def check_quantization_latency(
+    fp16_fn: Callable,
+    quantized_fn: Callable,
+    sample,
+    batch: Optional[list] = None,
+    max_latency_ratio: float = 1.0,
+    max_p99_ms: Optional[float] = None,
+    **benchmark_kwargs
+) -> dict:
+    """
+    Benchmarks FP16 and quantized models and checks for latency regression.
+
+    An alert is triggered if the quantized model's p95 latency (single-sample,
+    and batched if measured) exceeds max_latency_ratio times the FP16 p95, or
+    if its single-sample p99 exceeds max_p99_ms.
+
+    Args:
+        fp16_fn (callable): Inference function of the full-precision model.
+        quantized_fn (callable): Inference function of the quantized model.
+        sample: One input sample.
+        batch (list, optional): A batch of inputs. Defaults to None.
+        max_latency_ratio (float, optional): Allowed quantized/FP16 p95 ratio.
+                                             Defaults to 1.0 (must not be slower).
+        max_p99_ms (float, optional): Absolute p99 budget for the quantized model.
+                                      Defaults to None.
+        **benchmark_kwargs: Passed to benchmark_latency (warmup, iterations,
+                            num_threads, cpu_affinity).
+
+    Returns:
+        dict: 'latency_fp16' and 'latency_quantized' (benchmark_latency results),
+              'p95_ratio' (float) and 'latency_alert_triggered' (bool).
+    """
+    print("EdgeGuard: Benchmarking FP16 model latency...")
+    latency_fp16 = benchmark_latency(fp16_fn, sample, batch=batch, **benchmark_kwargs)
+    print("EdgeGuard: Benchmarking quantized model latency...")
+    latency_quantized = benchmark_latency(quantized_fn, sample, batch=batch, **benchmark_kwargs)
+
+    ratios = []
+    for mode in ("single", "batched"):
+        if latency_fp16[mode] is not None and latency_fp16[mode]["p95_ms"] > 0:
+            ratios.append(latency_quantized[mode]["p95_ms"] / latency_fp16[mode]["p95_ms"])
+    p95_ratio = max(ratios) if ratios else 0.0
+
+    for name, result in (("FP16", latency_fp16), ("Quantized", latency_quantized)):
+        single = result["single"]
+        print(f"EdgeGuard: {name} single-sample latency p50/p95/p99: "
+              f"{single['p50_ms']:.3f}/{single['p95_ms']:.3f}/{single['p99_ms']:.3f} ms")
+
+    latency_alert_triggered = p95_ratio > max_latency_ratio
+    if max_p99_ms is not None and latency_quantized["single"]["p99_ms"] > max_p99_ms:
+        latency_alert_triggered = True
+    if latency_alert_triggered:
+        print(f"EdgeGuard: ALERT! Quantized latency regressed (p95 ratio {p95_ratio:.2f}, limit {max_latency_ratio:.2f}).")
+    else:
+        print(f"EdgeGuard: Quantized latency is within limits (p95 ratio {p95_ratio:.2f}).")
+
+    return {
+        "latency_fp16": latency_fp16,
+        "latency_quantized": latency_quantized,
+        "p95_ratio": p95_ratio,
+        "latency_alert_triggered": latency_alert_triggered
+    }
+
 
 def check_quantization_accuracy(
     model_fp16_path: str,
     model_quantized_path: str,
     test_dataset_path: str,
-    accuracy_threshold_delta: float
+    accuracy_threshold_delta: float,
+    fp16_evaluator: Optional[Callable[[list], int]] = None,
+    quantized_evaluator: Optional[Callable[[list], int]] = None,
+    batch_size: int = 256,
+    decode: Callable = datastream.decode_lines,
+    fp16_runner: Optional[Callable] = None,
+    quantized_runner: Optional[Callable] = None,
+    diagnostic_batches: int = 8,
+    saturation_limit: Union[float, Dict[str, float], None] = None
 ) -> dict:
     """
-    Simulates the evaluation of FP16 and quantized models to check for accuracy drop.
+    Evaluates FP16 and quantized models to check for accuracy drop.
+
+    When evaluators are given, the test set is streamed in fixed-size batches
+    (see datastream.stream_batches) and each batch is passed to both
+    evaluators, which return the number of correct predictions. Memory use
+    stays bounded by the prefetched shards, regardless of dataset size.
+    Without evaluators, hardcoded accuracy values are used for simulation
+    purposes. Actual model loading and quantization logic will be added later.
 
-    This function currently uses hardcoded accuracy values for simulation purposes.
-    Actual model loading, evaluation, and quantization logic will be added later.
+    If the alert fires and hook-calling runners are given, a diagnostic pass
+    (profile_layer_errors) ranks the layers by quantization error.
 
     Args:
         model_fp16_path (str): Path to the full-precision (FP16) model.
         model_quantized_path (str): Path to the quantized model.
-        test_dataset_path (str): Path to the test dataset for evaluation.
+        test_dataset_path (str): Path to the test dataset for evaluation: a file,
+                                 a directory of shards or a glob pattern.
         accuracy_threshold_delta (float): The maximum allowable drop in accuracy
                                           before an alert is triggered.
+        fp16_evaluator (callable, optional): Returns the number of correct FP16
+                                             predictions for a batch. Defaults to None.
+        quantized_evaluator (callable, optional): Same, for the quantized model.
+                                                  Defaults to None.
+        batch_size (int, optional): Samples per evaluation batch. Defaults to 256.
+        decode (callable, optional): Shard decoder passed to stream_batches.
+                                     Defaults to datastream.decode_lines.
+        fp16_runner (callable, optional): runner(batch, hook) for the FP16 model,
+                                          used by the diagnostic pass. Defaults to None.
+        quantized_runner (callable, optional): Same, for the quantized model.
+                                               Defaults to None.
+        diagnostic_batches (int, optional): Batches sampled by the diagnostic pass.
+                                            Defaults to 8.
+        saturation_limit (float or dict, optional): Saturation limit for the
+                                                    diagnostic pass, globally or
+                                                    per layer (see
+                                                    profile_layer_errors).
+                                                    Defaults to None.
 
     Returns:
         dict: A dictionary containing:
@@ -32,16 +510,46 @@ def check_quantization_accuracy(
             - 'accuracy_drop' (float): The difference (accuracy_fp16 - accuracy_quantized).
             - 'alert_triggered' (bool): True if accuracy_drop > accuracy_threshold_delta,
                                         False otherwise.
+            - 'num_samples' (int): Number of samples evaluated, or None when simulated.
+            - 'layer_errors' (list): Ranked per-layer error summaries from the
+                                     diagnostic pass, or None if it did not run.
+
+    Raises:
+        ValueError: If only one of the evaluators or one of the runners is given.
+        FileNotFoundError: If evaluators or runners are given but
+                           test_dataset_path matches no shard files.
     """
-    print(f"EdgeGuard: Loading FP16 model from '{model_fp16_path}' and evaluating on '{test_dataset_path}'...")
-    # Simulate FP16 model evaluation
-    accuracy_fp16 = 0.85  # Simulated accuracy
-    print(f"EdgeGuard: FP16 model accuracy: {accuracy_fp16:.4f}")
+    if (fp16_evaluator is None) != (quantized_evaluator is None):
+        raise ValueError("fp16_evaluator and quantized_evaluator must be given together.")
+    if (fp16_runner is None) != (quantized_runner is None):
+        raise ValueError("fp16_runner and quantized_runner must be given together.")
+    if (fp16_evaluator is not None or fp16_runner is not None) and not datastream.list_shards(test_dataset_path):
+        # Falling back to simulated accuracies here would hide a mistyped path
+        raise FileNotFoundError(f"No test set shards found at '{test_dataset_path}'.")
 
-    print(f"EdgeGuard: Loading quantized model from '{model_quantized_path}' and evaluating on '{test_dataset_path}'...")
-    # Simulate quantized model evaluation
-    accuracy_quantized = 0.82  # Simulated accuracy, slightly lower
-    print(f"EdgeGuard: Quantized model accuracy: {accuracy_quantized:.4f}")
+    num_samples = None
+    if fp16_evaluator is not None:
+        print(f"EdgeGuard: Evaluating '{model_fp16_path}' and '{model_quantized_path}' on '{test_dataset_path}' in batches of {batch_size}...")
+        num_samples = correct_fp16 = correct_quantized = 0
+        for batch in datastream.stream_batches(test_dataset_path, batch_size=batch_size, decode=decode):
+            num_samples += len(batch)
+            correct_fp16 += fp16_evaluator(batch)
+            correct_quantized += quantized_evaluator(batch)
+        accuracy_fp16 = correct_fp16 / num_samples if num_samples else 0.0
+        accuracy_quantized = correct_quantized / num_samples if num_samples else 0.0
+        print(f"EdgeGuard: Evaluated {num_samples} samples.")
+        print(f"EdgeGuard: FP16 model accuracy: {accuracy_fp16:.4f}")
+        print(f"EdgeGuard: Quantized model accuracy: {accuracy_quantized:.4f}")
+    else:
+        print(f"EdgeGuard: Loading FP16 model from '{model_fp16_path}' and evaluating on '{test_dataset_path}'...")
+        # Simulate FP16 model evaluation
+        accuracy_fp16 = 0.85  # Simulated accuracy
+        print(f"EdgeGuard: FP16 model accuracy: {accuracy_fp16:.4f}")
+
+        print(f"EdgeGuard: Loading quantized model from '{model_quantized_path}' and evaluating on '{test_dataset_path}'...")
+        # Simulate quantized model evaluation
+        accuracy_quantized = 0.82  # Simulated accuracy, slightly lower
+        print(f"EdgeGuard: Quantized model accuracy: {accuracy_quantized:.4f}")
 
     accuracy_drop = accuracy_fp16 - accuracy_quantized
     print(f"EdgeGuard: Accuracy drop: {accuracy_drop:.4f}")
@@ -52,6 +560,19 @@ def check_quantization_accuracy(
     else:
         print(f"EdgeGuard: Accuracy drop ({accuracy_drop:.4f}) is within threshold ({accuracy_threshold_delta:.4f}).")
 
+    layer_errors = None
+    if alert_triggered and fp16_runner is not None:
+        print(f"EdgeGuard: Profiling per-layer quantization error on {diagnostic_batches} batches...")
+        layer_errors = profile_layer_errors(
+            fp16_runner,
+            quantized_runner,
+            datastream.stream_batches(test_dataset_path, batch_size=batch_size, decode=decode),
+            max_batches=diagnostic_batches,
+            saturation_limit=saturation_limit
+        )
+        print("EdgeGuard: Layers ranked by quantization error (consider keeping the top ones in higher precision):")
+        print(format_layer_report(layer_errors))
+
     return {
         "accuracy_fp16": accuracy_fp16,
         "accuracy_quantized": accuracy_quantized,
@@ -60,7 +581,9 @@ def check_quantization_accuracy(
         "model_fp16_path": model_fp16_path,
         "model_quantized_path": model_quantized_path,
         "test_dataset_path": test_dataset_path,
-        "accuracy_threshold_delta": accuracy_threshold_delta
+        "accuracy_threshold_delta": accuracy_threshold_delta,
+        "num_samples": num_samples,
+        "layer_errors": layer_errors
     }
 
 if __name__ == "__main__":
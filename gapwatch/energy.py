@@ -4,9 +4,22 @@ by tokens/forward pass.
 
 This module provides the GreenMeter class to estimate energy consumption
 and CO2 emissions for code execution, particularly for machine learning models.
+Power is sampled on a background thread and integrated incrementally, so the
+running totals are always available while a job is being monitored.
 """
+import os
+import sys
+import threading
 import time
 
+
+if __name__ == "__main__":
+    # Add the parent directory to sys.path so this file can be run directly,
+    # as cli.py does
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gapwatch import profiler
+
 # Placeholder for global or regional CO2 intensity (kg CO2 per kWh)
 # This would ideally be configurable or dynamically fetched.
 # Using an average European value for now.
@@ -14,11 +27,32 @@ import time
 # (Value for EU-27 in 2022 was 254 g/kWh = 0.254 kg/kWh, subject to change)
 DEFAULT_CO2_INTENSITY_KG_PER_KWH = 0.254
 
+# Shortest and longest time (s) between power samples taken by the sampler thread.
+DEFAULT_SAMPLE_INTERVAL_S = 1.0
+DEFAULT_MAX_SAMPLE_INTERVAL_S = 30.0
+
+# Adaptive sampling keeps the estimated integration error of each interval
+# below this fraction of the energy measured in it.
+DEFAULT_MAX_RELATIVE_ERROR = 0.01
+
+# Assumed average system power draw (W) until NVML/RAPL probes are integrated.
+SIMULATED_POWER_W = 150.0
+
+
+def simulated_power_source():
+    """Returns the simulated system power draw in watts."""
+    return SIMULATED_POWER_W
+
 class GreenMeter:
     """
     A class to monitor and estimate energy usage and CO2 emissions.
 
-    This initial version uses simulated energy readings and elapsed time.
+    While monitoring, a sampler thread reads the power source and integrates
+    the readings (trapezoidal rule) into a running energy total. The sampling
+    interval adapts: it doubles (up to `max_sample_interval_s`) while power is
+    steady and drops back to `sample_interval_s` when the estimated
+    integration error exceeds `max_relative_error`. The default power source
+    is simulated.
     Future versions will integrate with hardware monitoring tools like
     NVIDIA Management Library (NVML) and Intel Running Average Power Limit (RAPL).
     """
@@ -29,17 +63,72 @@ class GreenMeter:
 
         Args:
             config (dict, optional): Configuration parameters for the meter.
-                                     Currently unused, placeholder for future settings
-                                     (e.g., CO2 intensity, specific devices to monitor).
+                                     Supported keys:
+                                     - 'co2_intensity_kg_per_kwh' (float)
+                                     - 'sample_interval_s' (float): shortest time
+                                       between power samples (default 1.0).
+                                     - 'max_sample_interval_s' (float): longest time
+                                       between power samples (default 30.0). The
+                                       live counters (snapshot, /metrics) can be
+                                       this stale on steady power; lower it to
+                                       the scrape interval when exporting them.
+                                       Budget checks shorten the interval
+                                       themselves as a budget nears.
+                                     - 'max_relative_error' (float): integration
+                                       error bound per interval (default 0.01).
+                                     - 'adaptive_sampling' (bool): adapt the sampling
+                                       interval (default True; always off when
+                                       profiling, to keep stack samples uniform).
+                                     - 'power_source' (callable): returns the current
+                                       power draw in watts (default simulated).
+                                     - 'profile' (bool): attribute energy to the
+                                       monitoring thread's Python stack on each
+                                       sample (default False).
+                                     - 'max_kwh' / 'max_co2_kg' (float): energy and
+                                       emissions budgets checked on every sample.
+                                     - 'on_budget_exceeded' (callable): called once,
+                                       from the sampler thread, with a dict
+                                       describing the budget about to be exceeded.
+                                     - 'budget_stop_latency_s' (float): expected time
+                                       between on_budget_exceeded and the job
+                                       stopping (default 0.0). The callback fires
+                                       early enough for a job that stops within
+                                       this time to stay within budget at the
+                                       current power draw.
                                      Defaults to None.
         """
         self.start_time = None
         self.end_time = None
-        self.energy_readings = []  # Placeholder for actual energy readings
+        self.energy_readings = []  # One reading per power sample
         self.config = config if config is not None else {}
         self.co2_intensity = self.config.get(
             "co2_intensity_kg_per_kwh", DEFAULT_CO2_INTENSITY_KG_PER_KWH
         )
+        self.sample_interval_s = self.config.get("sample_interval_s", DEFAULT_SAMPLE_INTERVAL_S)
+        self.max_sample_interval_s = max(
+            self.sample_interval_s, self.config.get("max_sample_interval_s", DEFAULT_MAX_SAMPLE_INTERVAL_S)
+        )
+        self.max_relative_error = self.config.get("max_relative_error", DEFAULT_MAX_RELATIVE_ERROR)
+        self.adaptive_sampling = self.config.get("adaptive_sampling", True) and not self.config.get("profile")
+        self.power_source = self.config.get("power_source", simulated_power_source)
+        self.profiler = None
+        self.max_kwh = self.config.get("max_kwh")
+        self.max_co2_kg = self.config.get("max_co2_kg")
+        self.on_budget_exceeded = self.config.get("on_budget_exceeded")
+        self.budget_stop_latency_s = self.config.get("budget_stop_latency_s", 0.0)
+        self.budget_exceeded = None  # Set to the budget report once a budget trips
+
+        # Incremental state maintained by the sampler thread
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler_thread = None
+        self._energy_j = 0.0
+        self._error_j = 0.0  # Estimated integration error
+        self._last_sample_time = None
+        self._last_power_w = None
+        self._last_slope = None  # Power slope (W/s) over the previous interval
+        self._last_dt = None
+        self._interval_s = self.sample_interval_s  # Wait before the next sample
 
         # TODO: Initialize NVML handles if available and configured
         # TODO: Initialize RAPL interfaces if available and configured
@@ -54,10 +143,144 @@ class GreenMeter:
         self.start_time = time.time()
         self.end_time = None  # Reset end time
         self.energy_readings = [] # Reset readings for a new monitoring session
+        self._energy_j = 0.0
+        self._error_j = 0.0
+        self.budget_exceeded = None
+        self._last_sample_time = self.start_time
+        self._last_power_w = self.power_source()
+        self._last_slope = None
+        self._last_dt = None
+        self._interval_s = self.sample_interval_s
+        if self.config.get("profile"):
+            self.profiler = profiler.EnergyProfiler(thread_id=threading.get_ident())
+
+        self._stop_event.clear()
+        self._sampler_thread = threading.Thread(
+            target=self._sampler_loop, name="GreenMeterSampler", daemon=True
+        )
+        self._sampler_thread.start()
         print("GreenMeter: Monitoring started.")
-        # TODO: Start NVML polling thread/process
         # TODO: Record initial RAPL energy values
 
+    def _sampler_loop(self):
+        has_budget = self._budget_joules() is not None
+        if has_budget:
+            # The stop latency alone may already exceed the budget
+            self._limit_interval_to_budget()
+            self._check_budget()
+        while not self._stop_event.wait(self._interval_s):
+            self._sample()
+            if has_budget and self.budget_exceeded is None:
+                self._limit_interval_to_budget()
+                self._check_budget()
+
+    def _budget_joules(self):
+        """
+        Returns the tightest energy or emissions budget in joules, or None.
+
+        A CO2 budget is not in effect at a carbon intensity of zero.
+        """
+        budgets_j = []
+        if self.max_kwh is not None:
+            budgets_j.append(self.max_kwh * 3.6e6)
+        if self.max_co2_kg is not None and self.co2_intensity > 0:
+            budgets_j.append(self.max_co2_kg / self.co2_intensity * 3.6e6)
+        return min(budgets_j) if budgets_j else None
+
+    def _limit_interval_to_budget(self):
+        # Sample at least twice before the budget could be reached (less the stop
+        # latency) at the current power draw, so a backed-off interval cannot
+        # overshoot it.
+        budget_j = self._budget_joules()
+        with self._lock:
+            if self._last_power_w > 0:
+                time_to_budget_s = (budget_j - self._energy_j) / self._last_power_w - self.budget_stop_latency_s
+                self._interval_s = max(self.sample_interval_s, min(self._interval_s, time_to_budget_s / 2))
+
+    def _check_budget(self):
+        """
+        Checks whether a budget will be exceeded before the next sample.
+
+        The running total is projected one sampling interval plus the
+        expected stop latency ahead at the latest power draw, so a job that
+        stops within budget_stop_latency_s of the callback does not cross the
+        budget. Runs on the sampler thread.
+        """
+        with self._lock:
+            horizon_s = self._interval_s + self.budget_stop_latency_s
+            projected_kwh = (self._energy_j + self._last_power_w * horizon_s) / 3.6e6
+            current_kwh = self._energy_j / 3.6e6
+        projected_co2_kg = projected_kwh * self.co2_intensity
+
+        exceeded = None
+        if self.max_kwh is not None and projected_kwh >= self.max_kwh:
+            exceeded = "max_kwh"
+        elif self.max_co2_kg is not None and self.co2_intensity > 0 and projected_co2_kg >= self.max_co2_kg:
+            exceeded = "max_co2_kg"
+        if exceeded is None:
+            return
+
+        self.budget_exceeded = {
+            "budget": exceeded,
+            "limit": self.max_kwh if exceeded == "max_kwh" else self.max_co2_kg,
+            "total_kwh": current_kwh,
+            "co2_emissions_kg": current_kwh * self.co2_intensity,
+            "projected_kwh": projected_kwh,
+            "projected_co2_kg": projected_co2_kg
+        }
+        print(f"GreenMeter: Budget {exceeded} ({self.budget_exceeded['limit']}) is about to be exceeded.")
+        if self.on_budget_exceeded is not None:
+            self.on_budget_exceeded(self.budget_exceeded)
+
+    def _sample(self, now=None, frame=None):
+        """
+        Takes one power sample and integrates it into the running total.
+
+        The trapezoidal rule's error over an interval of length dt is about
+        dt**3 / 12 * |P''|; P'' is estimated from the change in slope between
+        the last two intervals. That estimate is accumulated as the error
+        bound and, with adaptive sampling, sets the next interval.
+
+        Args:
+            now (float, optional): Sample timestamp. Defaults to time.time().
+            frame (frame, optional): Stack to attribute the energy to when
+                                     profiling. Defaults to the monitored
+                                     thread's current stack.
+        """
+        power_w = self.power_source()
+        with self._lock:
+            now = time.time() if now is None else now
+            dt = now - self._last_sample_time
+            interval_j = (self._last_power_w + power_w) / 2 * dt
+            self._energy_j += interval_j
+
+            error_j = 0.0
+            if dt > 0:
+                slope = (power_w - self._last_power_w) / dt
+                if self._last_slope is not None:
+                    curvature = (slope - self._last_slope) / ((dt + self._last_dt) / 2)
+                    error_j = dt ** 3 / 12 * abs(curvature)
+                    self._error_j += error_j
+                self._last_slope = slope
+                self._last_dt = dt
+                if self.adaptive_sampling:
+                    allowed_j = self.max_relative_error * interval_j
+                    if error_j > allowed_j:
+                        self._interval_s = self.sample_interval_s
+                    elif error_j < allowed_j / 4:
+                        self._interval_s = min(self.max_sample_interval_s, self._interval_s * 2)
+
+            self._last_sample_time = now
+            self._last_power_w = power_w
+            self.energy_readings.append({
+                "timestamp": now,
+                "source": "simulated" if self.power_source is simulated_power_source else "power_source",
+                "power_w": power_w,
+                "value_kwh": interval_j / 3.6e6
+            })
+        if self.profiler is not None:
+            self.profiler.record(interval_j, frame=frame)
+
     def stop_monitoring(self):
         """
         Stops the energy monitoring process.
@@ -69,27 +292,68 @@ class GreenMeter:
             print("GreenMeter: Monitoring was not started. Call start_monitoring() first.")
             return None
 
+        self._stop_event.set()
+        if self._sampler_thread is not None:
+            self._sampler_thread.join()
+            self._sampler_thread = None
+
         self.end_time = time.time()
         elapsed_time_seconds = self.end_time - self.start_time
         print(f"GreenMeter: Monitoring stopped. Elapsed time: {elapsed_time_seconds:.2f} seconds.")
 
-        # TODO: Stop NVML polling
-        # TODO: Record final RAPL energy values and calculate CPU energy consumed
+        # Close the last sampling interval at the end time. When stopping from the
+        # monitored thread, attribute it to the caller rather than to this method.
+        frame = None
+        if self.profiler is not None and self.profiler.thread_id == threading.get_ident():
+            frame = sys._getframe(1)
+        self._sample(now=self.end_time, frame=frame)
 
-        # Simulate collecting some data (placeholder)
-        # In a real scenario, this would be derived from NVML/RAPL readings
-        # For now, let's estimate based on elapsed time and a hypothetical average power draw.
-        # This is highly speculative and for demonstration only.
-        # Assume an average power draw of 150W (0.15 kW) for the system during the task
-        simulated_average_power_kw = 0.150
-        simulated_kwh = simulated_average_power_kw * (elapsed_time_seconds / 3600)
-        self.energy_readings.append({
-            "timestamp": self.end_time,
-            "source": "simulated",
-            "value_kwh": simulated_kwh
-        })
+        # TODO: Record final RAPL energy values and calculate CPU energy consumed
         return elapsed_time_seconds
 
+    def snapshot(self):
+        """
+        Returns the live counters maintained by the sampler thread.
+
+        This is cheap (no recomputation over readings) and safe to call from
+        any thread while monitoring, e.g. from a metrics endpoint. The counters
+        are as of 'last_sample_time', which with adaptive sampling can be up to
+        max_sample_interval_s ago.
+
+        Returns:
+            dict: A dictionary containing 'monitoring' (bool), 'energy_joules',
+                  'co2_emissions_kg', 'power_watts' (latest reading, or None),
+                  'sample_count', 'estimated_error_joules', 'sample_interval_seconds'
+                  and 'last_sample_time'.
+        """
+        with self._lock:
+            return {
+                "monitoring": self._sampler_thread is not None,
+                "energy_joules": self._energy_j,
+                "co2_emissions_kg": self._energy_j / 3.6e6 * self.co2_intensity,
+                "power_watts": self._last_power_w,
+                "sample_count": len(self.energy_readings),
+                "estimated_error_joules": self._error_j,
+                "sample_interval_seconds": self._interval_s,
+                "last_sample_time": self._last_sample_time
+            }
+
+    def write_flamegraph(self, output_path):
+        """
+        Writes the energy-weighted profile in collapsed-stack format.
+
+        Each line is `frame;frame;...;frame <millijoules>`, which can be fed to
+        flamegraph.pl or speedscope. Requires the meter to have been created
+        with config {"profile": True}.
+
+        Args:
+            output_path (str): The path to write the collapsed stacks to.
+        """
+        if self.profiler is None:
+            print("GreenMeter: Profiling was not enabled. Pass config={'profile': True}.")
+            return
+        self.profiler.write_collapsed(output_path)
+
     def get_energy_usage(self, tokens_processed=None):
         """
         Estimates the total energy usage and CO2 emissions for the monitored period.
@@ -107,6 +371,8 @@ class GreenMeter:
                 - 'watt_hours_per_token': Estimated watt-hours per token (float),
                                           or None if tokens_processed is not provided.
                 - 'elapsed_time_seconds': Duration of monitoring in seconds (float).
+                - 'sample_count': Number of power samples taken (int).
+                - 'estimated_error_kwh': Estimated integration error bound in kWh (float).
         """
         if self.start_time is None or self.end_time is None:
             print("GreenMeter: Monitoring was not started or stopped properly.")
@@ -114,18 +380,18 @@ class GreenMeter:
                 "total_kwh": 0.0,
                 "co2_emissions_kg": 0.0,
                 "watt_hours_per_token": None,
-                "elapsed_time_seconds": 0.0
+                "elapsed_time_seconds": 0.0,
+                "sample_count": 0,
+                "estimated_error_kwh": 0.0
             }
 
-        # Placeholder: In a real implementation, sum up actual readings
-        # from self.energy_readings (collected from NVML, RAPL etc.)
-        # For now, using the single simulated reading from stop_monitoring()
+        # Sum up the per-sample readings collected by the sampler thread
         total_kwh = sum(reading.get("value_kwh", 0.0) for reading in self.energy_readings)
         if not self.energy_readings: # If stop_monitoring wasn't called or simulation didn't run
              # Fallback to a simpler time-based simulation if no "readings" were added
              # This is a very rough estimation if proper stop_monitoring simulation didn't occur
              elapsed_time_seconds = self.end_time - self.start_time
-             simulated_average_power_kw = 0.150 # Consistent with stop_monitoring simulation
+             simulated_average_power_kw = SIMULATED_POWER_W / 1000
              total_kwh = simulated_average_power_kw * (elapsed_time_seconds / 3600)
         else:
             elapsed_time_seconds = self.end_time - self.start_time
@@ -148,7 +414,9 @@ class GreenMeter:
             "total_kwh": total_kwh,
             "co2_emissions_kg": co2_emissions_kg,
             "watt_hours_per_token": watt_hours_per_token,
-            "elapsed_time_seconds": elapsed_time_seconds
+            "elapsed_time_seconds": elapsed_time_seconds,
+            "sample_count": len(self.energy_readings),
+            "estimated_error_kwh": self._error_j / 3.6e6
         }
 
 if __name__ == "__main__":
@@ -193,4 +461,15 @@ if __name__ == "__main__":
     usage_data_no_stop = meter_nostart.get_energy_usage() # No stop
     print(f"Energy Usage (No Stop): {usage_data_no_stop}")
 
+    # 5. Energy-weighted profiling
+    print("\n--- Energy Profiling ---")
+    meter_profiled = GreenMeter(config={"profile": True, "sample_interval_s": 0.05})
+    meter_profiled.start_monitoring()
+    deadline = time.time() + 1.0
+    while time.time() < deadline:
+        sum(i * i for i in range(10000)) # Simulate CPU-bound work
+    meter_profiled.stop_monitoring()
+    for stack, joules in meter_profiled.profiler.top_stacks(3):
+        print(f"{joules:10.3f} J  {stack}")
+
     print("\nGreenMeter demonstration finished.")
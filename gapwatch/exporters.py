@@ -0,0 +1,209 @@
+"""
+Module for exporting GreenMeter data to monitoring and analytics systems.
+
+This module provides an OpenMetrics (Prometheus) `/metrics` endpoint that
+serves a live GreenMeter's incremental counters, and Parquet writers for
+finished energy traces and run summaries. Parquet export requires the optional
+`pyarrow` dependency.
+"""
+import http.server
+import threading
+
+# Content type of the OpenMetrics text exposition format.
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Longest sampling interval (s) for a meter whose counters are scraped, so
+# that scrapes at a typical 15 s interval never see values older than that.
+SCRAPE_MAX_SAMPLE_INTERVAL_S = 15.0
+
+# Rows per Parquet row group for energy traces. Traces are written sorted by
+# timestamp, so each row group covers a contiguous time range and its min/max
+# statistics let readers skip row groups outside a queried range; 64k rows
+# keeps row groups at roughly a megabyte for the trace columns.
+DEFAULT_TRACE_ROW_GROUP_SIZE = 65536
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape_label_value(value)}"' for key, value in sorted(labels.items()))
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_openmetrics(meter, labels=None):
+    """
+    Renders a GreenMeter's live counters in OpenMetrics text format.
+
+    Only the meter's incremental counters are read (GreenMeter.snapshot), so
+    the cost of a scrape does not depend on the length of the run.
+
+    Args:
+        meter (GreenMeter): The meter to export.
+        labels (dict, optional): Labels added to every sample (e.g., run_id).
+                                 Defaults to None.
+
+    Returns:
+        str: The exposition text, terminated by "# EOF".
+    """
+    snapshot = meter.snapshot()
+    label_text = _format_labels(labels)
+    metrics = [
+        ("gapwatch_energy_joules", "counter", "joules", "Energy consumed since monitoring started.",
+         "_total", snapshot["energy_joules"]),
+        ("gapwatch_co2_emissions_kg", "counter", None, "Estimated CO2 emissions in kilograms.",
+         "_total", snapshot["co2_emissions_kg"]),
+        ("gapwatch_power_samples", "counter", None, "Power samples taken.",
+         "_total", snapshot["sample_count"]),
+        ("gapwatch_power_watts", "gauge", "watts", "Latest sampled power draw.",
+         "", snapshot["power_watts"]),
+        ("gapwatch_energy_error_joules", "gauge", "joules", "Estimated energy integration error bound.",
+         "", snapshot["estimated_error_joules"]),
+        ("gapwatch_sample_interval_seconds", "gauge", "seconds", "Current sampling interval.",
+         "", snapshot["sample_interval_seconds"]),
+        ("gapwatch_monitoring", "gauge", None, "1 while the meter is monitoring, else 0.",
+         "", 1 if snapshot["monitoring"] else 0),
+    ]
+    lines = []
+    for name, metric_type, unit, help_text, suffix, value in metrics:
+        if value is None:
+            continue
+        lines.append(f"# TYPE {name} {metric_type}")
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"{name}{suffix}{label_text} {value}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves a GreenMeter's live counters on an OpenMetrics `/metrics` endpoint.
+
+    The server runs on a daemon thread. Use port=0 to pick a free port, which
+    is then available as `port` after start(). Scrapes return the counters as
+    of the meter's last sample; configure the meter with
+    max_sample_interval_s=SCRAPE_MAX_SAMPLE_INTERVAL_S (or the scrape
+    interval) so adaptive sampling does not let them go stale.
+    """
+
+    def __init__(self, meter, host="127.0.0.1", port=9464, labels=None):
+        """
+        Initializes the MetricsServer.
+
+        Args:
+            meter (GreenMeter): The meter to export.
+            host (str, optional): Address to bind. Defaults to "127.0.0.1".
+            port (int, optional): Port to bind (0 for any free port). Defaults to 9464.
+            labels (dict, optional): Labels added to every sample. Defaults to None.
+        """
+        self.meter = meter
+        self.host = host
+        self.port = port
+        self.labels = labels
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Starts serving in the background."""
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404, "Only /metrics is served.")
+                    return
+                body = format_openmetrics(exporter.meter, labels=exporter.labels).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # Keep scrapes out of the job's output
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="GapWatchMetrics", daemon=True)
+        self._thread.start()
+        print(f"MetricsServer: Serving OpenMetrics at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        """Stops the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+
+def require_pyarrow():
+    """
+    Imports pyarrow for Parquet export.
+
+    Returns:
+        tuple: The pyarrow and pyarrow.parquet modules.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow. Install it with 'pip install pyarrow'.")
+    return pyarrow, pyarrow.parquet
+
+
+def export_trace_parquet(meter, output_path, run_id=None, row_group_size=DEFAULT_TRACE_ROW_GROUP_SIZE):
+    """
+    Writes a finished meter's power samples to a Parquet file.
+
+    Rows are sorted by timestamp and written in fixed-size row groups with
+    column statistics, so time-range scans can skip whole row groups.
+
+    Args:
+        meter (GreenMeter): A meter whose monitoring has stopped.
+        output_path (str): The path to write the Parquet file.
+        run_id (str, optional): Run identifier stored in every row. Defaults to None.
+        row_group_size (int, optional): Rows per row group.
+                                        Defaults to DEFAULT_TRACE_ROW_GROUP_SIZE.
+    """
+    pa, pq = require_pyarrow()
+    readings = sorted(meter.energy_readings, key=lambda reading: reading["timestamp"])
+    table = pa.table({
+        "run_id": pa.array([run_id] * len(readings), type=pa.string()),
+        "timestamp": pa.array([r["timestamp"] for r in readings], type=pa.float64()),
+        "power_w": pa.array([r.get("power_w") for r in readings], type=pa.float64()),
+        "energy_kwh": pa.array([r["value_kwh"] for r in readings], type=pa.float64()),
+        "source": pa.array([r.get("source") for r in readings], type=pa.string()),
+    })
+    pq.write_table(table, output_path, row_group_size=row_group_size, write_statistics=True)
+    print(f"Exporters: Wrote {len(readings)} trace rows to {output_path}")
+
+
+def export_runs_parquet(records, output_path, row_group_size=DEFAULT_TRACE_ROW_GROUP_SIZE):
+    """
+    Writes run summaries (e.g., RunStore "ci" records) to a Parquet file.
+
+    Records are sorted by 'timestamp' when present. Columns are the union of
+    the records' fields; missing values are written as nulls.
+
+    Args:
+        records (list): Run summary dicts.
+        output_path (str): The path to write the Parquet file.
+        row_group_size (int, optional): Rows per row group.
+                                        Defaults to DEFAULT_TRACE_ROW_GROUP_SIZE.
+    """
+    pa, pq = require_pyarrow()
+    records = sorted(records, key=lambda record: record.get("timestamp") or 0.0)
+    fields = sorted({field for record in records for field in record})
+    table = pa.table({field: [record.get(field) for record in records] for field in fields})
+    pq.write_table(table, output_path, row_group_size=row_group_size, write_statistics=True)
+    print(f"Exporters: Wrote {len(records)} run summaries to {output_path}")
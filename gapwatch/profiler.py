@@ -0,0 +1,105 @@
+"""
+Module for attributing sampled energy to Python code.
+
+This module provides the EnergyProfiler class, a statistical profiler driven by
+GreenMeter's power samples. On each sample it captures the monitored thread's
+stack via `sys._current_frames()` and charges the energy of the elapsed interval
+to that stack, producing an energy-weighted flame graph.
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+
+
+class EnergyProfiler:
+    """
+    Accumulates joules per Python call stack of one thread.
+
+    Only one stack walk is done per power sample, so the overhead scales with
+    the sampling rate rather than with the work done by the profiled code.
+    """
+
+    def __init__(self, thread_id):
+        """
+        Initializes the EnergyProfiler.
+
+        Args:
+            thread_id (int): Identifier (threading.get_ident()) of the thread
+                             whose stack is sampled.
+        """
+        self.thread_id = thread_id
+        self.joules_by_stack = defaultdict(float)
+        self.sample_count = 0
+        self.overhead_s = 0.0  # Time spent walking stacks, for overhead reporting
+        self._labels = {}  # Cache of code object -> frame label
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = f"{module}:{code.co_name}"
+            self._labels[code] = label
+        return label
+
+    def record(self, joules, frame=None):
+        """
+        Charges energy to the profiled thread's current stack.
+
+        Args:
+            joules (float): Energy consumed since the previous sample.
+            frame (frame, optional): Innermost frame to attribute the energy to.
+                                     Defaults to the profiled thread's current frame.
+        """
+        start = time.perf_counter()
+        if frame is None:
+            frame = sys._current_frames().get(self.thread_id)
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack = ";".join(reversed(labels)) if labels else "<no stack>"
+        self.joules_by_stack[stack] += joules
+        self.sample_count += 1
+        self.overhead_s += time.perf_counter() - start
+
+    def top_stacks(self, limit=10):
+        """
+        Returns the stacks that consumed the most energy.
+
+        Args:
+            limit (int, optional): Maximum number of stacks. Defaults to 10.
+
+        Returns:
+            list: (stack, joules) tuples, most energy first.
+        """
+        return sorted(self.joules_by_stack.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def collapsed_stacks(self):
+        """
+        Returns the profile in collapsed-stack format.
+
+        Returns:
+            list: Lines of `frame;frame;...;frame <millijoules>` (str), as
+                  expected by flamegraph.pl and speedscope.
+        """
+        return [
+            f"{stack} {round(joules * 1000)}"
+            for stack, joules in sorted(self.joules_by_stack.items())
+            if round(joules * 1000) > 0
+        ]
+
+    def write_collapsed(self, output_path):
+        """
+        Writes the collapsed-stack profile to a file.
+
+        Args:
+            output_path (str): The path to write the profile to.
+        """
+        try:
+            with open(output_path, "w") as f:
+                for line in self.collapsed_stacks():
+                    f.write(line + "\n")
+            print(f"EnergyProfiler: Flame graph data written to {output_path}")
+        except IOError as e:
+            print(f"EnergyProfiler: Error writing profile to {output_path}: {e}")
@@ -4,13 +4,362 @@ Module for locking Conda/Pip environments, seeds, and data URLs.
 This module provides functionality to create a manifest file (JSON-LD)
 that captures the state of the environment, ensuring reproducibility.
 """
+import concurrent.futures
+import hashlib
 import json
+import os
 import platform
 import subprocess
-import os
 import sys
+import tempfile
+import threading
+import time
+
+# Per-section time limits in seconds. A section that exceeds its limit is
+# recorded as a timeout and the manifest is marked as partial.
+DEFAULT_SECTION_TIMEOUTS = {
+    "python": 5,
+    "pip": 60,
+    "conda": 120,
+    "git": 10,
+    "hardware": 10,
+    "datasets": 300
+}
+
+# Manifest fields filled in by each section.
+SECTION_FIELDS = {
+    "python": ["python_version", "platform"],
+    "pip": ["pip_packages"],
+    "conda": ["conda_environment"],
+    "git": ["git_state"],
+    "hardware": ["hardware"],
+    "datasets": ["datasets"]
+}
+
+# Chunk size used when hashing dataset files.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# The process umask, read once at import: os.umask can only be read by setting
+# it, which must not happen while manifest section threads create files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _run_command(command, timeout):
+    result = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=timeout
+    )
+    return result.stdout.strip()
+
+
+def _collect_python(timeout):
+    return {"python_version": sys.version, "platform": platform.platform()}
+
+
+def _collect_pip(timeout):
+    try:
+        return {"pip_packages": _run_command(["pip", "freeze"], timeout).split("\n")}
+    except FileNotFoundError:
+        raise RuntimeError("pip command not found.")
+
+
+def _collect_conda(timeout):
+    conda_env_name = os.environ.get("CONDA_DEFAULT_ENV")
+    if not conda_env_name:
+        return {"conda_environment": "Not in a Conda environment or CONDA_DEFAULT_ENV not set."}
+    try:
+        # Storing the raw YAML string of the full export for now.
+        # Could be parsed further if needed.
+        export = _run_command(["conda", "env", "export"], timeout)
+    except FileNotFoundError:
+        raise RuntimeError("conda command not found, but CONDA_DEFAULT_ENV is set.")
+    return {"conda_environment": {"name": conda_env_name, "export": export}}
+
+
+def _collect_git(timeout):
+    # The three commands share one deadline, so the section as a whole is bounded
+    deadline = time.monotonic() + timeout
+
+    def run_git(command):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(command, timeout)
+        return _run_command(command, remaining)
+
+    try:
+        commit = run_git(["git", "rev-parse", "HEAD"])
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return {"git_state": "Not a git repository or git not installed."}
+    return {"git_state": {
+        "commit": commit,
+        "branch": run_git(["git", "rev-parse", "--abbrev-ref", "HEAD"]),
+        "dirty": bool(run_git(["git", "status", "--porcelain"]))
+    }}
+
+
+def _read_text(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def _read_hardware_inventory(root="/"):
+    """
+    Reads the hardware inventory from /proc and /sys under `root`.
+
+    Each source file is read once. Frequency limits and the governor are taken
+    from cpu0, assuming all cores share the same cpufreq policy.
+    """
+    proc = os.path.join(root, "proc")
+    sys_cpu = os.path.join(root, "sys", "devices", "system", "cpu")
+    sys_node = os.path.join(root, "sys", "devices", "system", "node")
+
+    cpu_model = None
+    logical_cpus = 0
+    physical_ids = set()
+    cores = set()
+    physical_id = core_id = None
+    for line in (_read_text(os.path.join(proc, "cpuinfo")) or "").split("\n") + [""]:
+        key, _, value = line.partition(":")
+        key, value = key.strip(), value.strip()
+        if key == "processor":
+            logical_cpus += 1
+        elif key == "model name" and cpu_model is None:
+            cpu_model = value
+        elif key == "physical id":
+            physical_id = value
+        elif key == "core id":
+            core_id = value
+        elif not key:
+            # A blank line ends one processor's block
+            if physical_id is not None:
+                physical_ids.add(physical_id)
+                cores.add((physical_id, core_id))
+            physical_id = core_id = None
+
+    memory_total_kb = None
+    for line in (_read_text(os.path.join(proc, "meminfo")) or "").split("\n"):
+        if line.startswith("MemTotal:"):
+            memory_total_kb = int(line.split()[1])
+            break
+
+    numa_nodes = {}
+    if os.path.isdir(sys_node):
+        for name in sorted(os.listdir(sys_node)):
+            if name.startswith("node") and name[4:].isdigit():
+                numa_nodes[name] = _read_text(os.path.join(sys_node, name, "cpulist"))
+
+    def read_khz(name):
+        value = _read_text(os.path.join(sys_cpu, "cpu0", "cpufreq", name))
+        return int(value) if value and value.isdigit() else None
+
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_model": cpu_model or platform.processor() or None,
+        "sockets": len(physical_ids) or None,
+        "physical_cores": len(cores) or None,
+        "logical_cpus": logical_cpus or os.cpu_count(),
+        "numa_nodes": numa_nodes,
+        "memory_total_kb": memory_total_kb,
+        "cpu_governor": _read_text(os.path.join(sys_cpu, "cpu0", "cpufreq", "scaling_governor")),
+        "cpu_min_freq_khz": read_khz("scaling_min_freq"),
+        "cpu_max_freq_khz": read_khz("scaling_max_freq"),
+        "cpu_hw_max_freq_khz": read_khz("cpuinfo_max_freq")
+    }
+
+
+# Fields that must match for performance numbers to be comparable across runs.
+FINGERPRINT_FIELDS = [
+    "machine", "cpu_model", "sockets", "physical_cores", "logical_cpus",
+    "numa_nodes", "memory_total_gib", "cpu_governor", "cpu_max_freq_khz"
+]
+
+# In-process cache of the hardware inventory, keyed by boot ID.
+_hardware_cache = {}
+
+
+def _user_cache_dir():
+    # Per-user cache directory (XDG), rather than the shared temp directory
+    # where another user could plant a spoofed inventory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "gapwatch")
+
+
+def hardware_fingerprint(inventory):
+    """
+    Returns a short stable digest of the performance-relevant hardware fields.
+
+    Args:
+        inventory (dict): A hardware inventory from get_hardware_inventory().
+    """
+    fields = {field: inventory.get(field) for field in FINGERPRINT_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:16]
+
 
-def create_manifest(output_path="gapwatch.jsonld"):
+def get_hardware_inventory(root="/", use_cache=True):
+    """
+    Returns the hardware inventory of this machine.
+
+    The inventory includes CPU model, socket/core/thread counts, NUMA topology,
+    total memory, CPU governor and frequency limits, plus a 'fingerprint' of
+    the fields in FINGERPRINT_FIELDS. Hardware does not change without a
+    reboot, so results are cached per boot ID, in-process and in a file only
+    the user can read or write ($XDG_CACHE_HOME/gapwatch, default
+    ~/.cache/gapwatch).
+
+    Args:
+        root (str, optional): Filesystem root holding /proc and /sys. Defaults to "/".
+        use_cache (bool, optional): Whether to use the boot ID cache. Defaults to True.
+
+    Returns:
+        dict: The hardware inventory.
+    """
+    boot_id = _read_text(os.path.join(root, "proc", "sys", "kernel", "random", "boot_id"))
+    cache_path = None
+    if use_cache and boot_id:
+        if boot_id in _hardware_cache:
+            return dict(_hardware_cache[boot_id])
+        cache_path = os.path.join(_user_cache_dir(), f"hardware-{boot_id}.json")
+        try:
+            with open(cache_path, "r") as f:
+                _hardware_cache[boot_id] = json.load(f)
+            return dict(_hardware_cache[boot_id])
+        except (IOError, OSError, json.JSONDecodeError):
+            pass
+
+    inventory = _read_hardware_inventory(root)
+    if inventory["memory_total_kb"]:
+        inventory["memory_total_gib"] = round(inventory["memory_total_kb"] / (1024 * 1024))
+    else:
+        inventory["memory_total_gib"] = None
+    inventory["boot_id"] = boot_id
+    inventory["fingerprint"] = hardware_fingerprint(inventory)
+
+    if cache_path:
+        _hardware_cache[boot_id] = inventory
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+            # NamedTemporaryFile creates the file 0600; the rename makes the write atomic
+            with tempfile.NamedTemporaryFile(
+                "w", dir=os.path.dirname(cache_path), prefix=".hardware-", suffix=".tmp", delete=False
+            ) as f:
+                temp_path = f.name
+                json.dump(inventory, f)
+            os.replace(temp_path, cache_path)
+            temp_path = None
+        except (IOError, OSError):
+            pass
+        finally:
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+    return dict(inventory)
+
+
+def _collect_hardware(timeout):
+    return {"hardware": get_hardware_inventory()}
+
+
+def check_hardware(manifest_path):
+    """
+    Compares the hardware recorded in a manifest with this machine.
+
+    Prints a warning listing the differing fields when the fingerprints differ,
+    since energy and throughput numbers are then not directly comparable.
+
+    Args:
+        manifest_path (str): Path to a manifest created by create_manifest().
+
+    Returns:
+        dict: Differing fields as name -> (recorded, current); empty if the
+              hardware matches or the manifest has no hardware inventory.
+    """
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (IOError, OSError, json.JSONDecodeError) as e:
+        print(f"Error reading manifest file {manifest_path}: {e}")
+        return {}
+
+    recorded = None
+    for item in manifest.get("@graph", []):
+        if item.get("@type") == "SoftwareEnvironment" and isinstance(item.get("hardware"), dict):
+            recorded = item["hardware"]
+    if not recorded or "fingerprint" not in recorded:
+        print("Warning: Manifest has no hardware fingerprint; cannot check hardware comparability.")
+        return {}
+
+    current = get_hardware_inventory()
+    if recorded["fingerprint"] == current["fingerprint"]:
+        return {}
+    differences = {
+        field: (recorded.get(field), current.get(field))
+        for field in FINGERPRINT_FIELDS
+        if recorded.get(field) != current.get(field)
+    }
+    print("Warning: Hardware differs from the recorded run; energy and throughput numbers may not be comparable.")
+    for field, (was, now) in differences.items():
+        print(f"  {field}: recorded {was!r}, current {now!r}")
+    return differences
+
+
+def hash_dataset(path, deadline=None):
+    """
+    Computes a SHA-256 digest of a dataset file or directory.
+
+    Directories are hashed over their files in sorted relative-path order,
+    including each relative path, so renames change the digest.
+
+    Args:
+        path (str): Path to a dataset file or directory.
+        deadline (float, optional): time.monotonic() value after which hashing
+                                    stops with a TimeoutError; checked between
+                                    chunks. Defaults to None (no deadline).
+
+    Returns:
+        dict: A dictionary containing 'path', 'sha256' and 'size_bytes'.
+    """
+    digest = hashlib.sha256()
+    size_bytes = 0
+    if os.path.isdir(path):
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+    else:
+        files = [path]
+
+    for file_path in files:
+        if file_path != path:
+            digest.update(os.path.relpath(file_path, path).encode() + b"\0")
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Hashing {path} exceeded its deadline.")
+                digest.update(chunk)
+                size_bytes += len(chunk)
+    return {"path": path, "sha256": digest.hexdigest(), "size_bytes": size_bytes}
+
+
+def _collect_datasets(timeout, data_paths=()):
+    deadline = time.monotonic() + timeout
+    return {"datasets": [hash_dataset(path, deadline=deadline) for path in data_paths]}
+
+
+def create_manifest(output_path="gapwatch.jsonld", data_paths=None, section_timeouts=None):
     """
     Creates a JSON-LD manifest file capturing environment details.
 
@@ -19,79 +368,122 @@ def create_manifest(output_path="gapwatch.jsonld"):
     - Platform information
     - Pip installed packages (from pip freeze)
     - Conda environment details (if applicable)
+    - Git state (commit, branch, uncommitted changes)
+    - Hardware inventory
+    - Dataset hashes (for the given data paths)
     - Placeholders for data URLs and seeds
 
+    Sections are collected concurrently, each with its own timeout. A section
+    that fails or times out is recorded as such and the manifest is marked as
+    partial. Per-section status and timing are stored under 'manifest_sections'.
+    Sections run on daemon threads and bound their own work (subprocess
+    timeouts, a deadline between dataset chunks), so a timed-out section does
+    not keep the process alive. The file is written atomically (temporary file
+    + rename) with the usual umask-based permissions, using the umask as of
+    import.
+
     Args:
         output_path (str): The path to write the JSON-LD manifest file.
                            Defaults to "gapwatch.jsonld".
+        data_paths (list, optional): Dataset files or directories to hash.
+                                     Defaults to None (no datasets).
+        section_timeouts (dict, optional): Per-section timeouts in seconds,
+                                           overriding DEFAULT_SECTION_TIMEOUTS.
     """
     manifest = {
         "@context": "https://w3id.org/ro/crate/1.1/context", # A common context for RO-Crate
         "@graph": []
     }
-    
+    timeouts = dict(DEFAULT_SECTION_TIMEOUTS, **(section_timeouts or {}))
+    collectors = {
+        "python": _collect_python,
+        "pip": _collect_pip,
+        "conda": _collect_conda,
+        "git": _collect_git,
+        "hardware": _collect_hardware,
+        "datasets": lambda timeout: _collect_datasets(timeout, data_paths or [])
+    }
+
     # Basic environment information
     env_info = {
         "@id": "#environment",
         "@type": "SoftwareEnvironment",
-        "python_version": sys.version,
-        "platform": platform.platform(),
+        "python_version": None,
+        "platform": None,
         "conda_environment": None,
         "pip_packages": None,
+        "git_state": None,
+        "hardware": None,
+        "datasets": [],
         "data_urls": [], # Placeholder
-        "seeds": {}      # Placeholder
+        "seeds": {},     # Placeholder
+        "partial": False,
+        "manifest_sections": {}
     }
 
-    # Get Pip freeze output
-    try:
-        pip_result = subprocess.run(
-            ["pip", "freeze"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        env_info["pip_packages"] = pip_result.stdout.strip().split("\n")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running 'pip freeze': {e}")
-        env_info["pip_packages"] = f"Error: {e}"
-    except FileNotFoundError:
-        print("Error: 'pip' command not found.")
-        env_info["pip_packages"] = "Error: pip command not found."
+    def timed(name):
+        start = time.perf_counter()
+        fields = collectors[name](timeouts[name])
+        return fields, time.perf_counter() - start
 
-    # Get Conda environment details
-    conda_env_name = os.environ.get("CONDA_DEFAULT_ENV")
-    if conda_env_name:
+    def run_section(name, future):
         try:
-            conda_result = subprocess.run(
-                ["conda", "env", "export"], # Using full export for more details
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            # Storing the raw YAML string for now.
-            # Could be parsed further if needed.
-            env_info["conda_environment"] = {
-                "name": conda_env_name,
-                "export": conda_result.stdout.strip()
-            }
-        except subprocess.CalledProcessError as e:
-            print(f"Error running 'conda env export': {e}")
-            env_info["conda_environment"] = f"Error: {e}"
-        except FileNotFoundError:
-            print("Error: 'conda' command not found, but CONDA_DEFAULT_ENV is set.")
-            env_info["conda_environment"] = "Error: conda command not found."
-    else:
-        env_info["conda_environment"] = "Not in a Conda environment or CONDA_DEFAULT_ENV not set."
+            future.set_result(timed(name))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # Daemon threads rather than an executor, whose workers are joined at
+    # interpreter exit even after their section timed out
+    start = time.perf_counter()
+    futures = {}
+    for name in collectors:
+        futures[name] = concurrent.futures.Future()
+        threading.Thread(
+            target=run_section, args=(name, futures[name]), name=f"GapWatchManifest-{name}", daemon=True
+        ).start()
+    for name, future in futures.items():
+        # Each section's deadline counts from the common start time
+        remaining = max(0.0, timeouts[name] - (time.perf_counter() - start))
+        status = "ok"
+        try:
+            fields, duration_s = future.result(timeout=remaining)
+        except (concurrent.futures.TimeoutError, subprocess.TimeoutExpired, TimeoutError):
+            status = "timeout"
+            duration_s = time.perf_counter() - start
+            message = f"Timeout: '{name}' section exceeded {timeouts[name]}s."
+            fields = {field: message for field in SECTION_FIELDS[name]}
+        except Exception as e:
+            status = "error"
+            duration_s = time.perf_counter() - start
+            fields = {field: f"Error: {e}" for field in SECTION_FIELDS[name]}
+        if status != "ok":
+            print(f"Manifest section '{name}' {status}: {next(iter(fields.values()))}")
+            env_info["partial"] = True
+        env_info.update(fields)
+        env_info["manifest_sections"][name] = {"status": status, "duration_s": duration_s}
 
     manifest["@graph"].append(env_info)
 
-    # Write the manifest to the output file
+    # Write the manifest atomically so readers never see a truncated file
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    temp_path = None
     try:
-        with open(output_path, "w") as f:
+        with tempfile.NamedTemporaryFile("w", dir=output_dir, prefix=".gapwatch-", suffix=".tmp", delete=False) as f:
+            temp_path = f.name
             json.dump(manifest, f, indent=4)
+        # NamedTemporaryFile creates the file 0600; give it the mode open() would
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, output_path)
+        temp_path = None
         print(f"Manifest created successfully at {output_path}")
-    except IOError as e:
+    except (IOError, OSError, TypeError, ValueError) as e:
         print(f"Error writing manifest file to {output_path}: {e}")
+    finally:
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
 
 if __name__ == "__main__":
     # Example usage:
@@ -0,0 +1,188 @@
+"""
+Module for persisting GapWatch results between runs.
+
+This module provides the RunStore class, a small append-only store that keeps
+one JSON Lines file per record kind (e.g., "bench", "ci") under a local
+directory, so results can be queried and compared across commits.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+# Default location of the run store, relative to the current working directory.
+DEFAULT_STORE_DIR = ".gapwatch"
+
+# Records appended since the column cache was written before it is rewritten.
+# Rewriting costs about as much as loading the cache, so a few new records are
+# cheaper to parse on every read than to fold into the cache each time.
+COLUMNS_CACHE_REWRITE_THRESHOLD = 1000
+
+
+class RunStore:
+    """
+    An append-only, file-backed store of GapWatch run records.
+
+    Records are plain JSON-serializable dicts. Each kind of record lives in its
+    own `<root>/<kind>.jsonl` file, one record per line, in insertion order.
+    Columnar reads (see columns) are cached in `<root>/<kind>.columns.json`.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        """
+        Initializes the RunStore.
+
+        Args:
+            root (str, optional): Directory holding the store files.
+                                  Defaults to DEFAULT_STORE_DIR.
+        """
+        self.root = root
+
+    def _path(self, kind):
+        return os.path.join(self.root, f"{kind}.jsonl")
+
+    def _columns_path(self, kind):
+        return os.path.join(self.root, f"{kind}.columns.json")
+
+    def _load_columns_cache(self, kind, path, fields):
+        # A cache is valid if it covers the requested fields and was built from
+        # a prefix of the current file (same first line, offset within the file)
+        try:
+            with open(self._columns_path(kind), "r") as f:
+                cache = json.load(f)
+            with open(path, "rb") as f:
+                head = hashlib.sha256(f.readline()).hexdigest()
+            if (cache["head"] == head and cache["offset"] <= os.path.getsize(path)
+                    and set(fields) <= set(cache["columns"])):
+                return cache
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def append(self, kind, record):
+        """
+        Appends a record to the store.
+
+        Args:
+            kind (str): The record kind, used as the file name (e.g., "bench").
+            record (dict): The JSON-serializable record to store.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(kind), "a") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+    def query(self, kind, **filters):
+        """
+        Returns all records of a kind whose fields equal the given filters.
+
+        Args:
+            kind (str): The record kind to read.
+            **filters: Field/value pairs that a record must match exactly.
+
+        Returns:
+            list: Matching records in insertion order (empty if none).
+        """
+        path = self._path(kind)
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"RunStore: Warning - Skipping corrupt record in {path}.")
+                    continue
+                if all(record.get(key) == value for key, value in filters.items()):
+                    records.append(record)
+        return records
+
+    def latest(self, kind, **filters):
+        """
+        Returns the most recently appended matching record, or None.
+        """
+        records = self.query(kind, **filters)
+        return records[-1] if records else None
+
+    def columns(self, kind, fields):
+        """
+        Returns records of a kind as columns, for vectorized analysis.
+
+        The columns read are cached on disk along with the byte offset of the
+        last record they cover, so later calls load the cached columns and only
+        parse records appended since (the cache is rewritten once
+        COLUMNS_CACHE_REWRITE_THRESHOLD of them have accumulated). The cache is
+        rebuilt if it is missing, lacks a requested field, or the records file
+        was rewritten.
+
+        Args:
+            kind (str): The record kind to read.
+            fields (list): Field names to extract; missing values become None.
+
+        Returns:
+            dict: field -> list of values, all lists in insertion order.
+        """
+        path = self._path(kind)
+        if not os.path.exists(path):
+            return {field: [] for field in fields}
+
+        cache = self._load_columns_cache(kind, path, fields)
+        rebuilt = cache is None
+        if rebuilt:
+            # Rebuild, keeping the fields cached so far
+            try:
+                with open(self._columns_path(kind), "r") as f:
+                    cached_fields = list(json.load(f)["columns"])
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                cached_fields = []
+            cache = {
+                "head": None,
+                "offset": 0,
+                "columns": {field: [] for field in dict.fromkeys(cached_fields + list(fields))}
+            }
+
+        columns = cache["columns"]
+        appended = 0
+        with open(path, "rb") as f:
+            if cache["head"] is None:
+                cache["head"] = hashlib.sha256(f.readline()).hexdigest()
+            f.seek(cache["offset"])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partially written record; picked up by a later call
+                cache["offset"] += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"RunStore: Warning - Skipping corrupt record in {path}.")
+                    continue
+                for field, column in columns.items():
+                    column.append(record.get(field))
+                appended += 1
+
+        if appended and (rebuilt or appended >= COLUMNS_CACHE_REWRITE_THRESHOLD):
+            self._write_columns_cache(kind, cache)
+        return {field: columns[field] for field in fields}
+
+    def _write_columns_cache(self, kind, cache):
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=self.root, prefix=f".{kind}.columns-", suffix=".tmp", delete=False) as f:
+                temp_path = f.name
+                f.write(json.dumps(cache, separators=(",", ":")))
+            os.replace(temp_path, self._columns_path(kind))
+            temp_path = None
+        except (IOError, OSError, TypeError, ValueError) as e:
+            print(f"RunStore: Warning - Could not write column cache for '{kind}': {e}")
+        finally:
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
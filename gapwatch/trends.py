@@ -0,0 +1,219 @@
+"""
+Module for trend analytics over the history of GapWatch CI runs.
+
+This module computes rolling baselines per branch for energy and accuracy
+metrics stored by `gapwatch ci`, and flags statistically significant
+changepoints (a shift in the mean between the runs before and after a point).
+The analysis works on columns with prefix sums, so each series is processed in
+a single linear pass.
+"""
+import math
+import os
+import subprocess
+from itertools import accumulate
+
+# Metrics analysed by default; for all of them, higher is worse.
+DEFAULT_METRICS = ["total_kwh", "watt_hours_per_token", "accuracy_drop"]
+
+# Number of runs in the rolling baseline and on each side of a changepoint.
+DEFAULT_WINDOW = 20
+
+# Welch t-statistic above which a mean shift counts as a changepoint.
+DEFAULT_T_THRESHOLD = 5.0
+
+# Smallest relative mean shift reported, so that statistically significant but
+# negligible shifts in very stable series are ignored.
+DEFAULT_MIN_RELATIVE_CHANGE = 0.05
+
+
+def get_git_branch():
+    """
+    Returns the current branch name, preferring GitHub Actions variables.
+
+    Returns:
+        str: The branch name, or "unknown" if it cannot be determined.
+    """
+    branch = os.getenv("GITHUB_HEAD_REF") or os.getenv("GITHUB_REF_NAME")
+    if branch:
+        return branch
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--abbrev-ref", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "unknown"
+
+
+def find_changepoints(values, window=DEFAULT_WINDOW, t_threshold=DEFAULT_T_THRESHOLD,
+                      min_relative_change=DEFAULT_MIN_RELATIVE_CHANGE):
+    """
+    Finds points where the mean of a series shifts significantly.
+
+    For every index i, the `window` values before i are compared with the
+    `window` values from i on using Welch's t-statistic; the strongest point
+    within each window of candidates above the threshold is reported. Window
+    means and variances come from prefix sums, so the scan is linear.
+
+    Args:
+        values (list): The series, in chronological order.
+        window (int, optional): Values on each side. Defaults to DEFAULT_WINDOW.
+        t_threshold (float, optional): Minimum |t| to report. Defaults to DEFAULT_T_THRESHOLD.
+        min_relative_change (float, optional): Minimum |after - before| / |before|
+                                               to report. Defaults to DEFAULT_MIN_RELATIVE_CHANGE.
+
+    Returns:
+        list: Dicts with 'index', 'before_mean', 'after_mean' and 't_stat'.
+    """
+    n = len(values)
+    if n < 2 * window:
+        return []
+    prefix = [0.0] + list(accumulate(values))
+    prefix_sq = [0.0] + list(accumulate(v * v for v in values))
+
+    # Mean and sample variance (may be slightly negative from rounding) of
+    # every window of `window` values, by start position
+    means = [(b - a) / window for a, b in zip(prefix, prefix[window:])]
+    correction = window / max(1, window - 1)
+    variances = [
+        ((b - a) / window - m * m) * correction
+        for a, b, m in zip(prefix_sq, prefix_sq[window:], means)
+    ]
+
+    # Compare the window ending before i (starting at i - window) with the one
+    # starting at i; only shifts above min_relative_change are tested further
+    shifted = [
+        i for i, before_mean, after_mean in zip(range(window, n - window + 1), means, means[window:])
+        if abs(after_mean - before_mean) >= min_relative_change * abs(before_mean)
+    ]
+    candidates = []
+    for i in shifted:
+        before_mean, after_mean = means[i - window], means[i]
+        diff = after_mean - before_mean
+        variance_sum = variances[i - window] + variances[i]
+        if variance_sum > 0:
+            t_stat = diff / math.sqrt(variance_sum / window)
+        elif diff != 0:
+            t_stat = math.copysign(math.inf, diff)
+        else:
+            continue
+        if abs(t_stat) >= t_threshold:
+            candidates.append((i, before_mean, after_mean, t_stat))
+
+    # Keep only the strongest candidate among those less than a window apart
+    changepoints = []
+    for candidate in candidates:
+        if changepoints and candidate[0] - changepoints[-1][0] < window:
+            if abs(candidate[3]) > abs(changepoints[-1][3]):
+                changepoints[-1] = candidate
+            continue
+        changepoints.append(candidate)
+    return [
+        {"index": i, "before_mean": before, "after_mean": after, "t_stat": t_stat}
+        for i, before, after, t_stat in changepoints
+    ]
+
+
+def compute_trends(columns, metrics=None, window=DEFAULT_WINDOW, t_threshold=DEFAULT_T_THRESHOLD,
+                   min_relative_change=DEFAULT_MIN_RELATIVE_CHANGE):
+    """
+    Computes per-branch rolling baselines and changepoints for each metric.
+
+    Args:
+        columns (dict): Columnar run history (see RunStore.columns) with a
+                        'branch' column, optional 'commit'/'timestamp' columns
+                        and one column per metric, in chronological order.
+        metrics (list, optional): Metric columns to analyse. Defaults to DEFAULT_METRICS.
+        window (int, optional): Baseline/changepoint window. Defaults to DEFAULT_WINDOW.
+        t_threshold (float, optional): Changepoint threshold. Defaults to DEFAULT_T_THRESHOLD.
+        min_relative_change (float, optional): Smallest relative shift reported.
+                                               Defaults to DEFAULT_MIN_RELATIVE_CHANGE.
+
+    Returns:
+        dict: branch -> metric -> {'runs', 'latest', 'baseline_mean',
+              'baseline_std', 'latest_z', 'changepoints', 'regressed'}, where
+              each changepoint also carries 'commit', 'timestamp' and
+              'regression' (the mean went up), and 'regressed' is True if the
+              most recent changepoint is a regression.
+    """
+    metrics = metrics or DEFAULT_METRICS
+    branches = columns.get("branch", [])
+    commits = columns.get("commit") or [None] * len(branches)
+    timestamps = columns.get("timestamp") or [None] * len(branches)
+
+    rows_by_branch = {}
+    for row, branch in enumerate(branches):
+        rows_by_branch.setdefault(branch, []).append(row)
+
+    report = {}
+    for branch, rows in rows_by_branch.items():
+        report[branch] = {}
+        for metric in metrics:
+            column = columns.get(metric)
+            if column is None:
+                continue
+            series_rows = [row for row in rows if column[row] is not None]
+            values = [float(column[row]) for row in series_rows]
+            if not values:
+                continue
+
+            baseline = values[-window - 1:-1] or values[-1:]
+            baseline_mean = sum(baseline) / len(baseline)
+            baseline_std = math.sqrt(sum((v - baseline_mean) ** 2 for v in baseline) / max(1, len(baseline) - 1))
+            latest_z = (values[-1] - baseline_mean) / baseline_std if baseline_std > 0 else 0.0
+
+            changepoints = find_changepoints(
+                values, window=window, t_threshold=t_threshold, min_relative_change=min_relative_change
+            )
+            for changepoint in changepoints:
+                row = series_rows[changepoint["index"]]
+                changepoint["commit"] = commits[row]
+                changepoint["timestamp"] = timestamps[row]
+                changepoint["regression"] = changepoint["after_mean"] > changepoint["before_mean"]
+
+            report[branch][metric] = {
+                "runs": len(values),
+                "latest": values[-1],
+                "baseline_mean": baseline_mean,
+                "baseline_std": baseline_std,
+                "latest_z": latest_z,
+                "changepoints": changepoints,
+                "regressed": bool(changepoints) and changepoints[-1]["regression"]
+            }
+    return report
+
+
+def format_trends_summary(report, branches=None):
+    """
+    Formats a trends report as Markdown, ready for a PR comment.
+
+    Args:
+        report (dict): Output of compute_trends.
+        branches (list, optional): Branches to include. Defaults to all.
+
+    Returns:
+        str: The Markdown summary.
+    """
+    lines = ["### GapWatch trends"]
+    for branch in branches or sorted(report):
+        if branch not in report:
+            continue
+        lines.append(f"\n**{branch}**\n")
+        lines.append("| Metric | Runs | Latest | Baseline (mean ± std) | Last changepoint |")
+        lines.append("|---|---|---|---|---|")
+        for metric, trend in report[branch].items():
+            last = trend["changepoints"][-1] if trend["changepoints"] else None
+            if last is None:
+                change = "none"
+            else:
+                commit = (last["commit"] or "")[:8] or f"run {last['index']}"
+                direction = "REGRESSION" if last["regression"] else "improvement"
+                change = f"{direction} at {commit}: {last['before_mean']:.6g} → {last['after_mean']:.6g}"
+            lines.append(
+                f"| {metric} | {trend['runs']} | {trend['latest']:.6g} | "
+                f"{trend['baseline_mean']:.6g} ± {trend['baseline_std']:.2g} | {change} |"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,29 @@
+import sys
+import os
+# Ensure gapwatch modules can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gapwatch import bench
+from gapwatch import runstore
+
+def test_run_benchmarks_records_result(tmp_path):
+    """Test that a benchmark run produces statistics and is stored by commit."""
+    store = runstore.RunStore(root=str(tmp_path / "store"))
+    results = bench.run_benchmarks(
+        names=["energy_integration_large_trace"], store=store, commit="abc123"
+    )
+    stats = results["benchmarks"]["energy_integration_large_trace"]
+    assert stats["repeat"] == 5
+    assert 0 < stats["min_s"] <= stats["median_s"]
+    assert bench.find_result(store, "abc123")["commit"] == "abc123"
+
+def test_compare_results_flags_regression():
+    """Test that only slowdowns beyond the noise threshold are flagged."""
+    baseline = {"commit": "a", "benchmarks": {
+        "fast": {"median_s": 1.0}, "noisy": {"median_s": 1.0}, "slow": {"median_s": 1.0}}}
+    candidate = {"commit": "b", "benchmarks": {
+        "fast": {"median_s": 0.5}, "noisy": {"median_s": 1.05}, "slow": {"median_s": 1.5}}}
+    rows = {row["name"]: row for row in bench.compare_results(baseline, candidate, threshold=0.10)}
+    assert rows["fast"]["regression"] is False
+    assert rows["noisy"]["regression"] is False
+    assert rows["slow"]["regression"] is True
+    assert abs(rows["slow"]["change"] - 0.5) < 1e-9
@@ -0,0 +1,40 @@
+import sys
+import os
+# Ensure gapwatch modules can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gapwatch import datastream
+
+def _write_shards(directory, num_shards, samples_per_shard):
+    directory.mkdir()
+    for shard in range(num_shards):
+        lines = [f"{shard * samples_per_shard + i}" for i in range(samples_per_shard)]
+        (directory / f"shard_{shard:03d}.txt").write_text("\n".join(lines) + "\n")
+    (directory / ".index").write_text("ignored")
+
+def test_stream_batches_fixed_size_in_order(tmp_path):
+    """Test that shards are streamed in order as fixed-size batches."""
+    _write_shards(tmp_path / "data", num_shards=5, samples_per_shard=7)
+    batches = list(datastream.stream_batches(str(tmp_path / "data"), batch_size=10, prefetch=2))
+
+    assert [len(b) for b in batches] == [10, 10, 10, 5]
+    samples = [int(s) for batch in batches for s in batch]
+    assert samples == list(range(35))
+
+    dropped = list(datastream.stream_batches(str(tmp_path / "data"), batch_size=10, drop_last=True))
+    assert [len(b) for b in dropped] == [10, 10, 10]
+
+def test_stream_batches_bounded_prefetch(tmp_path):
+    """Test that no more than `prefetch` shards are decoded ahead of the consumer."""
+    _write_shards(tmp_path / "data", num_shards=20, samples_per_shard=1)
+    decoded = []
+
+    def tracking_decode(buffer):
+        decoded.append(1)
+        return datastream.decode_lines(buffer)
+
+    stream = datastream.stream_batches(str(tmp_path / "data"), batch_size=1, decode=tracking_decode, prefetch=3)
+    next(stream)
+    import time
+    time.sleep(0.1) # Give the workers a chance to run ahead
+    assert len(decoded) <= 4 # The consumed shard plus at most 3 prefetched
+    assert sum(1 for _ in stream) == 19
@@ -27,3 +27,156 @@ def test_check_quantization_accuracy_alert():
         accuracy_threshold_delta=0.02 # Drop is 0.03, so this should trigger
     )
     assert results["alert_triggered"] is True
+
+def test_check_quantization_accuracy_streams_dataset(tmp_path):
+    """Test EdgeGuard evaluation over a sharded dataset with evaluators."""
+    data_dir = tmp_path / "shards"
+    data_dir.mkdir()
+    for shard in range(3):
+        (data_dir / f"part-{shard}.txt").write_text("\n".join(str(shard * 100 + i) for i in range(100)) + "\n")
+
+    batch_sizes = []
+    def fp16_evaluator(batch):
+        batch_sizes.append(len(batch))
+        return len(batch) # Every prediction correct
+    def quantized_evaluator(batch):
+        return sum(1 for sample in batch if int(sample) % 10 != 0) # 10% wrong
+
+    results = edgeguard.check_quantization_accuracy(
+        model_fp16_path="dummy/fp16.pth",
+        model_quantized_path="dummy/quant.pth",
+        test_dataset_path=str(data_dir),
+        accuracy_threshold_delta=0.05,
+        fp16_evaluator=fp16_evaluator,
+        quantized_evaluator=quantized_evaluator,
+        batch_size=64
+    )
+    assert results["num_samples"] == 300
+    assert batch_sizes == [64, 64, 64, 64, 44]
+    assert results["accuracy_fp16"] == 1.0
+    assert abs(results["accuracy_quantized"] - 0.9) < 1e-9
+    assert results["alert_triggered"] is True
+
+def test_check_quantization_accuracy_missing_dataset_raises(tmp_path):
+    """Test that evaluators with no resolvable shards fail instead of simulating."""
+    import pytest
+
+    with pytest.raises(FileNotFoundError):
+        edgeguard.check_quantization_accuracy(
+            model_fp16_path="dummy/fp16.pth",
+            model_quantized_path="dummy/quant.pth",
+            test_dataset_path=str(tmp_path / "missing"),
+            accuracy_threshold_delta=0.05,
+            fp16_evaluator=len,
+            quantized_evaluator=len
+        )
+    with pytest.raises(ValueError):
+        edgeguard.check_quantization_accuracy(
+            model_fp16_path="dummy/fp16.pth",
+            model_quantized_path="dummy/quant.pth",
+            test_dataset_path=str(tmp_path / "missing"),
+            accuracy_threshold_delta=0.05,
+            fp16_evaluator=len
+        )
+
+def test_profile_layer_errors_ranks_worst_layer_first():
+    """Test per-layer error statistics and ranking across streamed batches."""
+    def quantize(values, step, limit):
+        return [max(-limit, min(limit, round(v / step) * step)) for v in values]
+
+    fp_runner = edgeguard.sequential_runner([
+        ("embed", lambda batch: [float(x) for x in batch]),
+        ("dense", lambda xs: [x * 0.5 for x in xs]),
+    ])
+    quant_runner = edgeguard.sequential_runner([
+        ("embed", lambda batch: [float(x) for x in batch]), # Exact
+        ("dense", lambda xs: quantize([x * 0.5 for x in xs], step=0.25, limit=2.0)),
+    ])
+    batches = iter([[0.1 * i for i in range(50)] for _ in range(20)])
+
+    rows = edgeguard.profile_layer_errors(fp_runner, quant_runner, batches, max_batches=4, saturation_limit=2.0)
+
+    assert [row["layer"] for row in rows] == ["dense", "embed"]
+    assert rows[0]["num_values"] == 200 # Only 4 batches sampled
+    assert rows[0]["mse"] > 0 and rows[0]["cosine_similarity"] < 1.0
+    assert rows[0]["saturation_rate"] > 0
+    assert rows[1]["mse"] == 0.0 and abs(rows[1]["cosine_similarity"] - 1.0) < 1e-12
+    assert sum(1 for _ in batches) == 16 # Remaining batches were not consumed
+    assert "dense" in edgeguard.format_layer_report(rows).splitlines()[1]
+
+def test_layer_error_stats_array_path_matches_lists():
+    """Test that NumPy activations give the same statistics as plain lists."""
+    import pytest
+    numpy = pytest.importorskip("numpy")
+
+    fp = [[0.1 * i, -0.2 * i] for i in range(50)]
+    quantized = [[round(a * 4) / 4, max(-2.0, round(b * 4) / 4)] for a, b in fp]
+    list_stats = edgeguard.LayerErrorStats("dense", saturation_limit=2.0)
+    list_stats.update(fp, quantized)
+    array_stats = edgeguard.LayerErrorStats("dense", saturation_limit=2.0)
+    array_stats.update(numpy.array(fp), numpy.array(quantized))
+
+    for key, value in list_stats.summary().items():
+        assert array_stats.summary()[key] == pytest.approx(value)
+
+def test_check_quantization_accuracy_diagnostic_uses_saturation_limit(tmp_path):
+    """Test that the saturation limit reaches the diagnostic pass."""
+    data_dir = tmp_path / "shards"
+    data_dir.mkdir()
+    (data_dir / "part-0.txt").write_text("\n".join(str(i) for i in range(20)) + "\n")
+    fp_runner = edgeguard.sequential_runner([("dense", lambda batch: [float(x) for x in batch])])
+    quant_runner = edgeguard.sequential_runner([("dense", lambda batch: [min(10.0, float(x)) for x in batch])])
+
+    results = edgeguard.check_quantization_accuracy(
+        model_fp16_path="dummy/fp16.pth",
+        model_quantized_path="dummy/quant.pth",
+        test_dataset_path=str(data_dir),
+        accuracy_threshold_delta=0.05,
+        fp16_evaluator=len,
+        quantized_evaluator=lambda batch: len(batch) // 2,
+        fp16_runner=fp_runner,
+        quantized_runner=quant_runner,
+        saturation_limit={"dense": 10.0}
+    )
+    assert results["layer_errors"][0]["saturation_rate"] == 0.5
+
+def test_latency_histogram_percentiles():
+    """Test that histogram percentiles are within the bucket precision."""
+    histogram = edgeguard.LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000) # 1 ms .. 1000 ms
+    summary = histogram.summary()
+    assert summary["count"] == 1000
+    assert abs(summary["p50_ms"] - 500) / 500 < 0.01
+    assert abs(summary["p99_ms"] - 990) / 990 < 0.01
+    assert summary["max_ms"] == 1000
+    assert len(histogram.counts) < 1000 # Buckets, not raw samples
+
+def test_check_quantization_latency_alerts_on_slower_quantized_model():
+    """Test the latency gate for quantized models slower than FP16."""
+    results = edgeguard.check_quantization_latency(
+        fp16_fn=edgeguard.simulated_model(cost=0.5),
+        quantized_fn=edgeguard.simulated_model(cost=3.0),
+        sample=[0],
+        batch=[0] * 4,
+        warmup=2,
+        iterations=30,
+        num_threads=2
+    )
+    assert results["latency_quantized"]["single"]["count"] == 30
+    assert results["latency_quantized"]["batched"]["count"] == 30
+    assert results["p95_ratio"] > 1.0
+    assert results["latency_alert_triggered"] is True
+
+def test_benchmark_latency_rejects_invalid_settings():
+    """Test that zero callers, zero iterations or unavailable CPUs are rejected."""
+    import pytest
+
+    model = edgeguard.simulated_model(cost=0.1)
+    with pytest.raises(ValueError):
+        edgeguard.benchmark_latency(model, [0], warmup=0, num_threads=0)
+    with pytest.raises(ValueError):
+        edgeguard.benchmark_latency(model, [0], warmup=0, iterations=0)
+    if hasattr(os, "sched_getaffinity"):
+        with pytest.raises(ValueError):
+            edgeguard.benchmark_latency(model, [0], warmup=0, cpu_affinity=[max(os.sched_getaffinity(0)) + 1])
@@ -40,3 +40,139 @@ def test_green_meter_no_monitoring_calls():
     assert usage_data["co2_emissions_kg"] == 0.0
     assert usage_data["watt_hours_per_token"] is None
     assert usage_data["elapsed_time_seconds"] == 0.0
+
+
+def test_green_meter_sampler_integrates_power():
+    """Test that the sampler thread integrates the configured power source."""
+    meter = energy.GreenMeter(config={"power_source": lambda: 3600.0, "sample_interval_s": 0.01})
+    meter.start_monitoring()
+    time.sleep(0.1)
+    elapsed = meter.stop_monitoring()
+
+    assert len(meter.energy_readings) > 1
+    usage_data = meter.get_energy_usage()
+    # 3600 W for `elapsed` seconds is elapsed Wh
+    assert abs(usage_data["total_kwh"] - elapsed / 1000) < 1e-9
+
+
+def _burn_energy(seconds):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        sum(i for i in range(1000))
+
+
+def test_green_meter_profile_attributes_energy(tmp_path):
+    """Test that profiling charges energy to the monitored thread's functions."""
+    meter = energy.GreenMeter(config={"profile": True, "sample_interval_s": 0.01})
+    meter.start_monitoring()
+    _burn_energy(0.2)
+    meter.stop_monitoring()
+
+    total_j = meter.get_energy_usage()["total_kwh"] * 3.6e6
+    profiled_j = sum(meter.profiler.joules_by_stack.values())
+    assert abs(profiled_j - total_j) < 1e-6
+    burn_j = sum(j for stack, j in meter.profiler.joules_by_stack.items() if "_burn_energy" in stack)
+    assert burn_j > 0.5 * total_j
+
+    output_file = tmp_path / "energy.collapsed"
+    meter.write_flamegraph(str(output_file))
+    lines = output_file.read_text().splitlines()
+    assert any("test_energy:_burn_energy" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_green_meter_budget_callback_fires_once():
+    """Test that the budget callback fires from the sampler before the budget is crossed."""
+    reports = []
+    meter = energy.GreenMeter(config={
+        "power_source": lambda: 3.6e6,  # 1 kWh per second
+        "sample_interval_s": 0.01,
+        "max_kwh": 0.05,
+        "on_budget_exceeded": reports.append
+    })
+    meter.start_monitoring()
+    time.sleep(0.2)
+    meter.stop_monitoring()
+
+    assert len(reports) == 1
+    assert reports[0]["budget"] == "max_kwh"
+    assert reports[0]["total_kwh"] < 0.05 <= reports[0]["projected_kwh"]
+    assert meter.budget_exceeded is reports[0]
+
+
+def test_green_meter_budget_accounts_for_stop_latency():
+    """Test that the budget callback fires early enough for the job to stop within budget."""
+    reports = []
+    meter = energy.GreenMeter(config={
+        "power_source": lambda: 3.6e6,  # 1 kWh per second
+        "sample_interval_s": 0.01,
+        "max_kwh": 0.5,
+        "budget_stop_latency_s": 0.3,
+        "on_budget_exceeded": reports.append
+    })
+    meter.start_monitoring()
+    time.sleep(0.4)
+    meter.stop_monitoring()
+
+    assert len(reports) == 1
+    # Another 0.3 s at the latest power draw stays within the budget
+    assert reports[0]["total_kwh"] + 0.3 < 0.5 <= reports[0]["projected_kwh"]
+
+
+def test_green_meter_co2_budget_with_zero_intensity_keeps_sampling():
+    """Test that a CO2 budget with zero carbon intensity does not stop the sampler."""
+    meter = energy.GreenMeter(config={
+        "sample_interval_s": 0.01,
+        "co2_intensity_kg_per_kwh": 0.0,
+        "max_co2_kg": 1.0
+    })
+    meter.start_monitoring()
+    time.sleep(0.1)
+    meter.stop_monitoring()
+
+    assert meter.get_energy_usage()["sample_count"] > 3
+    assert meter.budget_exceeded is None
+
+
+def _drive_sampler(meter, power_at, duration_s):
+    """Runs the sampler loop logic on a simulated clock."""
+    clock = [0.0]
+    meter.power_source = lambda: power_at(clock[0])
+    meter.start_time = 0.0
+    meter._last_sample_time = 0.0
+    meter._last_power_w = power_at(0.0)
+    intervals = []
+    while clock[0] < duration_s:
+        clock[0] = min(duration_s, clock[0] + meter._interval_s)
+        meter._sample(now=clock[0])
+        intervals.append(meter._interval_s)
+    meter.end_time = duration_s
+    return intervals
+
+
+def test_green_meter_adaptive_sampling_backs_off_when_steady():
+    """Test exponential back-off on steady power and fast sampling on change."""
+    meter = energy.GreenMeter(config={"sample_interval_s": 1.0, "max_sample_interval_s": 16.0})
+    intervals = _drive_sampler(meter, lambda t: 100.0 if t < 200 else 100.0 + (t - 200) ** 2, 230)
+
+    assert intervals[:5] == [2.0, 4.0, 8.0, 16.0, 16.0]
+    assert min(intervals[4:]) == 1.0 # Power started changing quickly after t=200
+    assert max(intervals[-5:]) < 16.0
+    usage_data = meter.get_energy_usage()
+    assert usage_data["sample_count"] == len(intervals)
+    assert usage_data["sample_count"] < 230 / 2
+
+
+def test_green_meter_adaptive_sampling_error_bound():
+    """Test that the integration error stays near the configured bound."""
+    import math
+    power_at = lambda t: 150.0 + 100.0 * math.sin(t / 20.0)
+    meter = energy.GreenMeter(config={"sample_interval_s": 0.5, "max_sample_interval_s": 60.0, "max_relative_error": 0.001})
+    _drive_sampler(meter, power_at, 600)
+
+    exact_j = 150.0 * 600 + 100.0 * 20.0 * (1 - math.cos(600 / 20.0))
+    usage_data = meter.get_energy_usage()
+    measured_j = usage_data["total_kwh"] * 3.6e6
+    assert abs(measured_j - exact_j) / exact_j < 0.002
+    assert usage_data["estimated_error_kwh"] > 0
+    assert usage_data["sample_count"] < 600 / 0.5 # Fewer samples than fixed-rate sampling
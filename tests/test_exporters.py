@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+import urllib.error
+import urllib.request
+import pytest
+# Ensure gapwatch modules can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gapwatch import energy
+from gapwatch import exporters
+
+def test_metrics_server_serves_live_counters():
+    """Test the /metrics endpoint against a live meter."""
+    meter = energy.GreenMeter(config={"power_source": lambda: 200.0, "sample_interval_s": 0.01})
+    server = exporters.MetricsServer(meter, port=0, labels={"run_id": 'run "1"'})
+    server.start()
+    try:
+        meter.start_monitoring()
+        time.sleep(0.05)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.headers["Content-Type"] == exporters.OPENMETRICS_CONTENT_TYPE
+            body = response.read().decode("utf-8")
+        meter.stop_monitoring()
+
+        lines = body.splitlines()
+        assert lines[-1] == "# EOF"
+        assert "# TYPE gapwatch_energy_joules counter" in lines
+        assert 'gapwatch_power_watts{run_id="run \\"1\\""} 200.0' in lines
+        assert 'gapwatch_monitoring{run_id="run \\"1\\""} 1' in lines
+        energy_line = next(line for line in lines if line.startswith("gapwatch_energy_joules_total"))
+        assert float(energy_line.rsplit(" ", 1)[1]) > 0
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other")
+    finally:
+        server.stop()
+
+def test_export_parquet_trace_and_runs(tmp_path):
+    """Test Parquet export of a finished trace and run summaries."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    meter = energy.GreenMeter()
+    meter.energy_readings = [
+        {"timestamp": float(t), "source": "simulated", "power_w": 150.0, "value_kwh": 150.0 / 3.6e6}
+        for t in reversed(range(1000))
+    ]
+    trace_file = tmp_path / "trace.parquet"
+    exporters.export_trace_parquet(meter, str(trace_file), run_id="run-1", row_group_size=100)
+
+    parquet_file = pq.ParquetFile(str(trace_file))
+    assert parquet_file.metadata.num_row_groups == 10
+    first_group = parquet_file.metadata.row_group(0).column(1).statistics
+    assert (first_group.min, first_group.max) == (0.0, 99.0) # Sorted by timestamp
+    table = parquet_file.read()
+    assert table.column("run_id").to_pylist()[0] == "run-1"
+
+    runs_file = tmp_path / "runs.parquet"
+    exporters.export_runs_parquet(
+        [{"timestamp": 2.0, "total_kwh": 0.2, "branch": "main"}, {"timestamp": 1.0, "total_kwh": 0.1}],
+        str(runs_file)
+    )
+    runs = pq.read_table(str(runs_file)).to_pydict()
+    assert runs["total_kwh"] == [0.1, 0.2]
+    assert runs["branch"] == [None, "main"]
+
+def test_export_parquet_without_pyarrow(tmp_path, monkeypatch):
+    """Test that Parquet export reports a missing pyarrow with install instructions."""
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError, match="pip install pyarrow"):
+        exporters.export_runs_parquet([{"timestamp": 1.0}], str(tmp_path / "runs.parquet"))
+    assert not (tmp_path / "runs.parquet").exists()
@@ -41,3 +41,142 @@ def test_create_manifest_content(tmp_path):
             env_info_found = True
             break
     assert env_info_found, "SoftwareEnvironment info not found in @graph"
+
+def test_create_manifest_section_timeout_marks_partial(tmp_path, monkeypatch):
+    """Test that a hung section times out without stalling the manifest."""
+    import time
+
+    def hung_git(timeout):
+        time.sleep(2)
+        return {"git_state": "never returned"}
+    monkeypatch.setattr(replay, "_collect_git", hung_git)
+
+    output_file = tmp_path / "test_manifest.jsonld"
+    start = time.time()
+    replay.create_manifest(output_path=str(output_file), section_timeouts={"git": 0.2})
+    assert time.time() - start < 2
+
+    env_info = json.loads(output_file.read_text())["@graph"][0]
+    assert env_info["partial"] is True
+    assert env_info["git_state"].startswith("Timeout")
+    assert env_info["manifest_sections"]["git"]["status"] == "timeout"
+    assert env_info["manifest_sections"]["python"]["status"] == "ok"
+    assert [p.name for p in tmp_path.iterdir()] == ["test_manifest.jsonld"] # No temp files left
+
+def test_create_manifest_timeout_does_not_delay_exit(tmp_path):
+    """Test that a hung section does not keep the process alive after its timeout."""
+    import subprocess
+    import time
+
+    script = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))!r})\n"
+        "from gapwatch import replay\n"
+        "replay._collect_pip = lambda timeout: time.sleep(6)\n"
+        f"replay.create_manifest(output_path={str(tmp_path / 'm.jsonld')!r}, section_timeouts={{'pip': 0.2}})\n"
+    )
+    start = time.time()
+    subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, timeout=30)
+    assert time.time() - start < 5
+
+def test_hash_dataset_stops_at_deadline(tmp_path):
+    """Test that dataset hashing stops once its deadline has passed."""
+    import pytest
+    import time
+
+    data_file = tmp_path / "data.bin"
+    data_file.write_bytes(b"x" * 10)
+    with pytest.raises(TimeoutError):
+        replay.hash_dataset(str(data_file), deadline=time.monotonic() - 1)
+
+def test_create_manifest_file_permissions_and_cleanup(tmp_path, monkeypatch):
+    """Test that the manifest gets umask-based permissions and failed writes leave no temp file."""
+    output_file = tmp_path / "test_manifest.jsonld"
+    monkeypatch.setattr(replay, "_UMASK", 0o027)
+    replay.create_manifest(output_path=str(output_file))
+    assert output_file.stat().st_mode & 0o777 == 0o640
+
+    def failing_dump(obj, f, **kwargs):
+        raise TypeError("not serializable")
+    monkeypatch.setattr(replay.json, "dump", failing_dump)
+    replay.create_manifest(output_path=str(tmp_path / "other.jsonld"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["test_manifest.jsonld"]
+
+def test_create_manifest_hashes_datasets(tmp_path):
+    """Test that dataset paths are hashed into the manifest."""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_bytes(b"hello")
+    (data_dir / "b.txt").write_bytes(b"world")
+
+    output_file = tmp_path / "test_manifest.jsonld"
+    replay.create_manifest(output_path=str(output_file), data_paths=[str(data_dir)])
+
+    env_info = json.loads(output_file.read_text())["@graph"][0]
+    assert env_info["datasets"] == [replay.hash_dataset(str(data_dir))]
+    assert env_info["datasets"][0]["size_bytes"] == 10
+    (data_dir / "b.txt").write_bytes(b"World")
+    assert replay.hash_dataset(str(data_dir))["sha256"] != env_info["datasets"][0]["sha256"]
+
+def _write_fake_hardware_tree(root, governor="performance"):
+    files = {
+        "proc/cpuinfo": (
+            "processor\t: 0\nmodel name\t: Test CPU @ 3.00GHz\nphysical id\t: 0\ncore id\t\t: 0\n\n"
+            "processor\t: 1\nmodel name\t: Test CPU @ 3.00GHz\nphysical id\t: 0\ncore id\t\t: 0\n\n"
+            "processor\t: 2\nmodel name\t: Test CPU @ 3.00GHz\nphysical id\t: 0\ncore id\t\t: 1\n\n"
+        ),
+        "proc/meminfo": "MemTotal:       16384000 kB\nMemFree:         1000 kB\n",
+        "proc/sys/kernel/random/boot_id": "test-boot-id\n",
+        "sys/devices/system/node/node0/cpulist": "0-2\n",
+        "sys/devices/system/cpu/cpu0/cpufreq/scaling_governor": governor + "\n",
+        "sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq": "3000000\n",
+    }
+    for rel_path, content in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+def test_get_hardware_inventory_reads_proc_and_sys(tmp_path):
+    """Test hardware inventory parsing from a fake /proc and /sys tree."""
+    _write_fake_hardware_tree(tmp_path)
+    inventory = replay.get_hardware_inventory(root=str(tmp_path), use_cache=False)
+
+    assert inventory["cpu_model"] == "Test CPU @ 3.00GHz"
+    assert inventory["logical_cpus"] == 3
+    assert inventory["physical_cores"] == 2
+    assert inventory["sockets"] == 1
+    assert inventory["numa_nodes"] == {"node0": "0-2"}
+    assert inventory["memory_total_kb"] == 16384000
+    assert inventory["cpu_governor"] == "performance"
+    assert inventory["cpu_max_freq_khz"] == 3000000
+    assert inventory["boot_id"] == "test-boot-id"
+
+    other_root = tmp_path / "other"
+    _write_fake_hardware_tree(other_root, governor="powersave")
+    other = replay.get_hardware_inventory(root=str(other_root), use_cache=False)
+    assert other["fingerprint"] != inventory["fingerprint"]
+
+def test_get_hardware_inventory_caches_in_user_cache_dir(tmp_path, monkeypatch):
+    """Test that the hardware cache is a private file in the user's cache directory."""
+    _write_fake_hardware_tree(tmp_path / "root")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(replay, "_hardware_cache", {})
+    inventory = replay.get_hardware_inventory(root=str(tmp_path / "root"))
+
+    cache_file = tmp_path / "cache" / "gapwatch" / "hardware-test-boot-id.json"
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+    assert json.loads(cache_file.read_text())["fingerprint"] == inventory["fingerprint"]
+    assert os.listdir(tmp_path / "cache" / "gapwatch") == ["hardware-test-boot-id.json"]
+
+def test_check_hardware_warns_on_mismatch(tmp_path, monkeypatch):
+    """Test that replay detects a differing hardware fingerprint."""
+    output_file = tmp_path / "test_manifest.jsonld"
+    replay.create_manifest(output_path=str(output_file))
+    assert replay.check_hardware(str(output_file)) == {}
+
+    manifest = json.loads(output_file.read_text())
+    manifest["@graph"][0]["hardware"]["cpu_model"] = "Some Other CPU"
+    manifest["@graph"][0]["hardware"]["fingerprint"] = "0000000000000000"
+    output_file.write_text(json.dumps(manifest))
+    differences = replay.check_hardware(str(output_file))
+    assert differences["cpu_model"][0] == "Some Other CPU"
@@ -0,0 +1,49 @@
+import sys
+import os
+# Ensure gapwatch modules can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gapwatch import runstore
+
+def test_run_store_append_and_query(tmp_path):
+    """Test that records round-trip and can be filtered by field."""
+    store = runstore.RunStore(root=str(tmp_path / "store"))
+    store.append("ci", {"branch": "main", "total_kwh": 0.1})
+    store.append("ci", {"branch": "dev", "total_kwh": 0.2})
+    store.append("ci", {"branch": "main", "total_kwh": 0.3})
+
+    assert len(store.query("ci")) == 3
+    main_runs = store.query("ci", branch="main")
+    assert [r["total_kwh"] for r in main_runs] == [0.1, 0.3]
+    assert store.latest("ci", branch="main")["total_kwh"] == 0.3
+
+def test_run_store_missing_kind(tmp_path):
+    """Test that querying an empty store returns no records."""
+    store = runstore.RunStore(root=str(tmp_path / "store"))
+    assert store.query("bench") == []
+    assert store.latest("bench") is None
+
+def test_run_store_columns(tmp_path):
+    """Test columnar access with missing fields."""
+    store = runstore.RunStore(root=str(tmp_path / "store"))
+    store.append("ci", {"branch": "main", "total_kwh": 0.1})
+    store.append("ci", {"branch": "dev"})
+    columns = store.columns("ci", ["branch", "total_kwh"])
+    assert columns == {"branch": ["main", "dev"], "total_kwh": [0.1, None]}
+
+def test_run_store_columns_cache(tmp_path, monkeypatch):
+    """Test that cached columns pick up appended records, new fields and rewrites."""
+    store = runstore.RunStore(root=str(tmp_path / "store"))
+    store.append("ci", {"branch": "main", "total_kwh": 0.1})
+    assert store.columns("ci", ["branch"]) == {"branch": ["main"]}
+    assert (tmp_path / "store" / "ci.columns.json").exists()
+
+    monkeypatch.setattr(runstore, "COLUMNS_CACHE_REWRITE_THRESHOLD", 2)
+    store.append("ci", {"branch": "dev", "total_kwh": 0.2})
+    with open(store._path("ci"), "a") as f:
+        f.write('{"branch": "partial"') # Record still being written
+    assert store.columns("ci", ["branch"]) == {"branch": ["main", "dev"]}
+    assert store.columns("ci", ["total_kwh", "branch"]) == {"total_kwh": [0.1, 0.2], "branch": ["main", "dev"]}
+
+    os.remove(store._path("ci"))
+    store.append("ci", {"branch": "release"})
+    assert store.columns("ci", ["branch", "total_kwh"]) == {"branch": ["release"], "total_kwh": [None]}
@@ -0,0 +1,46 @@
+import sys
+import os
+import random
+# Ensure gapwatch modules can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gapwatch import trends
+
+def _history(kwh_values, branch="main"):
+    n = len(kwh_values)
+    return {
+        "branch": [branch] * n,
+        "commit": [f"commit{i:04d}" for i in range(n)],
+        "timestamp": [float(i) for i in range(n)],
+        "total_kwh": kwh_values,
+        "accuracy_drop": [0.03] * n,
+    }
+
+def test_compute_trends_detects_regression_changepoint():
+    """Test that a step increase in kWh is flagged at the right run."""
+    rng = random.Random(42)
+    kwh = [0.10 + rng.gauss(0, 0.002) for _ in range(100)] + [0.13 + rng.gauss(0, 0.002) for _ in range(60)]
+    report = trends.compute_trends(_history(kwh), metrics=["total_kwh", "accuracy_drop"])
+
+    kwh_trend = report["main"]["total_kwh"]
+    assert kwh_trend["runs"] == 160
+    assert len(kwh_trend["changepoints"]) == 1
+    changepoint = kwh_trend["changepoints"][0]
+    assert abs(changepoint["index"] - 100) <= 2
+    assert changepoint["commit"] == f"commit{changepoint['index']:04d}"
+    assert changepoint["regression"] is True
+    assert kwh_trend["regressed"] is True
+
+    # A constant metric has no changepoints
+    assert report["main"]["accuracy_drop"]["changepoints"] == []
+    assert report["main"]["accuracy_drop"]["regressed"] is False
+
+def test_compute_trends_stable_series_and_summary():
+    """Test that noise alone is not flagged and the summary is PR-ready Markdown."""
+    rng = random.Random(7)
+    history = _history([0.10 + rng.gauss(0, 0.002) for _ in range(200)], branch="feature")
+    report = trends.compute_trends(history, metrics=["total_kwh"])
+    assert report["feature"]["total_kwh"]["changepoints"] == []
+
+    summary = trends.format_trends_summary(report)
+    assert "**feature**" in summary
+    assert "| total_kwh | 200 |" in summary